@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+"""Benchmark the startup time of build_docs
+
+Usage (from the top level of this repository):
+
+    python -m benchmarks.bench_startup [--repeat N] [-o startup_results.json]
+
+Editor integrations and pre-commit hooks call build_docs many times, mostly just to
+get the build plan or to do a build that has nothing to do; for these callers, the
+time spent starting up dominates. This times the following, each as a fresh Python
+process:
+- python_baseline: starting Python and doing nothing, for reference
+- plan_only: running build_docs --plan-only
+- noop_build: running build_docs with a Makefile whose build target does nothing
+
+The results are written in the same format as benchmarks.run_benchmarks, so they can
+be compared between commits with 'python -m benchmarks.run_benchmarks compare'.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.run_benchmarks import summarize_times, benchmark_metadata
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_BUILD_DOCS_SCRIPT = os.path.join(_REPO_ROOT, "build_docs")
+
+def time_command(command, cwd, repeat):
+    """Run the given command repeat times; return a dict of results"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = _REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.check_call(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return summarize_times(times)
+
+def run_startup_benchmarks(repeat):
+    """Time each of the startup scenarios; return a dict of results"""
+    source_dir = tempfile.mkdtemp(prefix="build_docs_startup_")
+    try:
+        with open(os.path.join(source_dir, "Makefile"), "w") as makefile:
+            makefile.write("html:\n\t@true\n")
+        build_dir = os.path.join(source_dir, "_build")
+        commands = {
+            "python_baseline": [sys.executable, "-c", "pass"],
+            "plan_only": [sys.executable, _BUILD_DOCS_SCRIPT, "-b", build_dir,
+                          "--plan-only"],
+            "noop_build": [sys.executable, _BUILD_DOCS_SCRIPT, "-b", build_dir],
+        }
+        results = {}
+        for name, command in commands.items():
+            results[name] = time_command(command, cwd=source_dir, repeat=repeat)
+            print("{:<30} median {:8.1f} ms".format(name, 1000 * results[name]["median"]))
+    finally:
+        shutil.rmtree(source_dir, ignore_errors=True)
+    return results
+
+def main(cmdline_args=None):
+    """Top-level function for the startup benchmark"""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="Number of timed runs per scenario.\n"
+                        "Default is 20.")
+    parser.add_argument("-o", "--output", default="bench_results_startup.json",
+                        help="JSON file in which to store the results.\n"
+                        "Default is bench_results_startup.json.")
+    opts = parser.parse_args(cmdline_args)
+
+    results = run_startup_benchmarks(opts.repeat)
+    output = {"meta": benchmark_metadata({"repeat": opts.repeat}),
+              "results": results}
+    with open(opts.output, "w") as outfile:
+        json.dump(output, outfile, indent=2, sort_keys=True)
+    print("Results written to {}".format(opts.output))
+
+if __name__ == '__main__':
+    main()
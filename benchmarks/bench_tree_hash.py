@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+"""Benchmark hashing a large build tree with doc_builder.tree_hash
+
+Usage (from the top level of this repository):
+
+    python -m benchmarks.bench_tree_hash [--small-files N] [--large-files N]
+                                         [-o tree_hash_results.json]
+
+This generates a tree of many small files (like the html pages of a large manual) and
+a few large ones (like images and downloads), then times:
+- naive: os.walk, then reading each file in full and hashing it with hashlib, one
+  file at a time
+- hash_tree_cold: doc_builder.tree_hash.hash_tree with an empty index
+- hash_tree_warm: hash_tree with the index from a previous run, with no files changed
+- hash_tree_one_changed: hash_tree with the index from a previous run, after changing
+  one file
+
+Files are read from the operating system's page cache in all scenarios (the tree has
+just been written), so this measures the cost of hashing and of Python-level
+overhead rather than of disk reads.
+
+The results are written in the same format as benchmarks.run_benchmarks, so they can
+be compared between commits with 'python -m benchmarks.run_benchmarks compare'.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from benchmarks.run_benchmarks import summarize_times, benchmark_metadata
+from doc_builder.tree_hash import hash_tree
+
+# A modification time (in seconds since the epoch) long enough ago that hash_tree
+# trusts its index entries
+_OLD_MTIME = 1000000000
+
+def make_tree(root, num_small, num_large, large_size, seed=0):
+    """Write a tree of files under root; return the path of one of the small files"""
+    rng = random.Random(seed)
+    paths = []
+    for file_num in range(num_small):
+        subdir = os.path.join(root, "html", "dir{:03d}".format(file_num % 100))
+        os.makedirs(subdir, exist_ok=True)
+        path = os.path.join(subdir, "page{:06d}.html".format(file_num))
+        with open(path, "wb") as outfile:
+            outfile.write(os.urandom(rng.randint(2000, 20000)))
+        paths.append(path)
+    os.makedirs(os.path.join(root, "html", "_downloads"), exist_ok=True)
+    for file_num in range(num_large):
+        path = os.path.join(root, "html", "_downloads", "large{:03d}.bin".format(file_num))
+        with open(path, "wb") as outfile:
+            outfile.write(os.urandom(large_size))
+        paths.append(path)
+    for path in paths:
+        os.utime(path, (_OLD_MTIME, _OLD_MTIME))
+    return paths[0]
+
+def naive_hash_tree(root):
+    """Hash every file under root the straightforward way, for comparison"""
+    hashes = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path, "rb") as infile:
+                hashes[os.path.relpath(path, root)] = hashlib.sha256(
+                    infile.read()).hexdigest()
+    return hashes
+
+def time_function(function, repeat, prepare=None):
+    """Call function repeat times (calling prepare before each); return a dict of results"""
+    times = []
+    for _ in range(repeat):
+        if prepare is not None:
+            prepare()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return summarize_times(times)
+
+def run_tree_hash_benchmarks(opts):
+    """Generate a tree and time each of the hashing scenarios; return a dict of results"""
+    workdir = tempfile.mkdtemp(prefix="build_docs_tree_hash_")
+    try:
+        root = os.path.join(workdir, "tree")
+        index_path = os.path.join(workdir, "index.json")
+        changed_file = make_tree(root,
+                                 num_small=opts.small_files,
+                                 num_large=opts.large_files,
+                                 large_size=opts.large_size_mb * 1024 * 1024)
+
+        def remove_index():
+            if os.path.exists(index_path):
+                os.remove(index_path)
+
+        def change_file():
+            with open(changed_file, "ab") as outfile:
+                outfile.write(b"x")
+            # Keep the modification time old, so the index entry is trusted on the
+            # following run
+            mtime = os.stat(changed_file).st_mtime + 1
+            os.utime(changed_file, (mtime, mtime))
+
+        results = {}
+        results["naive"] = time_function(lambda: naive_hash_tree(root), opts.repeat)
+        results["hash_tree_cold"] = time_function(
+            lambda: hash_tree(root, index_path=index_path), opts.repeat,
+            prepare=remove_index)
+        hash_tree(root, index_path=index_path)
+        results["hash_tree_warm"] = time_function(
+            lambda: hash_tree(root, index_path=index_path), opts.repeat)
+        results["hash_tree_one_changed"] = time_function(
+            lambda: hash_tree(root, index_path=index_path), opts.repeat,
+            prepare=change_file)
+        for name, result in results.items():
+            print("{:<30} median {:8.3f} s".format(name, result["median"]))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def main(cmdline_args=None):
+    """Top-level function for the tree hashing benchmark"""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--small-files", type=int, default=20000,
+                        help="Number of small (2-20 KB) files.\n"
+                        "Default is 20000.")
+    parser.add_argument("--large-files", type=int, default=10,
+                        help="Number of large files.\n"
+                        "Default is 10.")
+    parser.add_argument("--large-size-mb", type=int, default=16,
+                        help="Size of each large file, in MB.\n"
+                        "Default is 16.")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Number of timed runs per scenario.\n"
+                        "Default is 3.")
+    parser.add_argument("-o", "--output", default="bench_results_tree_hash.json",
+                        help="JSON file in which to store the results.\n"
+                        "Default is bench_results_tree_hash.json.")
+    opts = parser.parse_args(cmdline_args)
+
+    results = run_tree_hash_benchmarks(opts)
+    params = {"small_files": opts.small_files,
+              "large_files": opts.large_files,
+              "large_size_mb": opts.large_size_mb,
+              "repeat": opts.repeat}
+    output = {"meta": benchmark_metadata(params),
+              "results": results}
+    with open(opts.output, "w") as outfile:
+        json.dump(output, outfile, indent=2, sort_keys=True)
+    print("Results written to {}".format(opts.output))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""
+Generate synthetic documentation projects for benchmarking build_docs
+
+A generated project looks like a typical Sphinx project: a Makefile, a conf.py, an
+index page with a toctree, a set of pages that cross-reference each other, and a set of
+images referenced from those pages.
+
+If Sphinx is installed, the Makefile is the standard Sphinx makefile, so the build
+exercises the real toolchain. Otherwise, a fake Makefile is written that mimics the
+structure of a Sphinx build (one output file per page, images copied to _images, make
+timestamps used for incremental rebuilds, only the files listed in SPHINXOPTS built if
+any are given), so that build_docs itself can still be benchmarked.
+"""
+
+import os
+import random
+
+# Name of the directory (relative to the project root) holding the generated pages
+PAGES_DIR = "pages"
+
+# Name of the directory (relative to the project root) holding the generated images
+IMAGES_DIR = "images"
+
+# A tiny valid PNG (1x1 pixel), used as the base for the generated images
+_PNG_HEADER = bytes.fromhex(
+    "89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489"
+    "0000000d49444154789c6360000002000001e221bc330000000049454e44ae426082")
+
+_SPHINX_MAKEFILE = """
+SPHINXOPTS    ?=
+SPHINXBUILD   ?= sphinx-build
+SOURCEDIR     = .
+BUILDDIR      ?= _build
+
+help:
+\t@$(SPHINXBUILD) -M help "$(SOURCEDIR)" "$(BUILDDIR)" $(SPHINXOPTS) $(O)
+
+.PHONY: help Makefile
+
+%: Makefile
+\t@$(SPHINXBUILD) -M $@ "$(SOURCEDIR)" "$(BUILDDIR)" $(SPHINXOPTS) $(O)
+"""
+
+# Fake Makefile used when Sphinx isn't available. Each page is "rendered" by a pattern
+# rule, so make -j parallelism and make's timestamp-based incremental rebuilds behave
+# much like they do for a real Sphinx build.
+_FAKE_MAKEFILE = """
+BUILDDIR ?= _build
+SPHINXOPTS ?=
+OUTDIR = $(BUILDDIR)/html
+PAGES = $(wildcard {pages_dir}/*.rst) index.rst
+IMAGES = $(wildcard {images_dir}/*.png)
+HTML = $(patsubst %.rst,$(OUTDIR)/%.html,$(PAGES))
+IMAGES_OUT = $(patsubst {images_dir}/%,$(OUTDIR)/_images/%,$(IMAGES))
+
+# Like sphinx-build, if specific files are given in SPHINXOPTS, only build those
+ONLY = $(filter %.rst,$(SPHINXOPTS))
+ifneq ($(ONLY),)
+HTML = $(patsubst %.rst,$(OUTDIR)/%.html,$(ONLY))
+IMAGES_OUT =
+endif
+
+html: $(HTML) $(IMAGES_OUT)
+
+$(OUTDIR)/%.html: %.rst conf.py
+\t@mkdir -p $(dir $@)
+\t@sed -e 's/^/<p>/' -e 's/$$/<\\/p>/' $< > $@
+
+$(OUTDIR)/_images/%: {images_dir}/%
+\t@mkdir -p $(dir $@)
+\t@cp $< $@
+
+clean:
+\t@rm -rf $(BUILDDIR)/*
+
+.PHONY: html clean
+"""
+
+def sphinx_available():
+    """Return True if Sphinx can be imported in this environment"""
+    try:
+        import sphinx  # pylint: disable=import-outside-toplevel,unused-import
+    except ImportError:
+        return False
+    return True
+
+def make_synthetic_project(dest, num_pages, num_xrefs=5, num_images=0,
+                           use_sphinx=None, seed=0):
+    """Write a synthetic documentation project into the directory dest
+
+    Returns a list of paths (relative to dest) of the generated pages, not including
+    the index page.
+
+    Args:
+    - dest: string: directory in which to write the project; created if needed
+    - num_pages: int: number of pages (in addition to the index page)
+    - num_xrefs: int: number of cross-references from each page to other pages
+    - num_images: int: number of distinct images; these are spread across the pages
+    - use_sphinx: bool or None: whether to write a real Sphinx Makefile (True) or a
+        fake one (False); if None, a real one is written if Sphinx is available
+    - seed: int: seed for the random number generator, so that the same arguments
+        always give the same project
+    """
+    if use_sphinx is None:
+        use_sphinx = sphinx_available()
+    rng = random.Random(seed)
+
+    os.makedirs(os.path.join(dest, PAGES_DIR), exist_ok=True)
+    os.makedirs(os.path.join(dest, IMAGES_DIR), exist_ok=True)
+
+    if use_sphinx:
+        makefile_contents = _SPHINX_MAKEFILE
+    else:
+        makefile_contents = _FAKE_MAKEFILE.format(pages_dir=PAGES_DIR,
+                                                  images_dir=IMAGES_DIR)
+    _write_file(os.path.join(dest, "Makefile"), makefile_contents)
+    _write_file(os.path.join(dest, "conf.py"),
+                "project = 'Synthetic benchmark project'\n"
+                "exclude_patterns = ['_build']\n")
+
+    images = []
+    for image_num in range(num_images):
+        image_name = "image{:05d}.png".format(image_num)
+        # Append some trailing bytes so that each image has distinct contents and a
+        # realistic size; PNG readers ignore data after the IEND chunk.
+        padding = bytes(rng.getrandbits(8) for _ in range(rng.randint(1000, 20000)))
+        with open(os.path.join(dest, IMAGES_DIR, image_name), "wb") as image_file:
+            image_file.write(_PNG_HEADER + padding)
+        images.append(image_name)
+
+    page_names = ["page{:05d}".format(page_num) for page_num in range(num_pages)]
+    pages = []
+    for page_num, page_name in enumerate(page_names):
+        others = [name for name in page_names if name != page_name]
+        xrefs = rng.sample(others, min(num_xrefs, len(others)))
+        if images:
+            page_images = [images[page_num % len(images)]]
+        else:
+            page_images = []
+        page_path = os.path.join(PAGES_DIR, page_name + ".rst")
+        _write_file(os.path.join(dest, page_path),
+                    _page_contents(page_name, xrefs, page_images, rng))
+        pages.append(page_path)
+
+    _write_file(os.path.join(dest, "index.rst"), _index_contents(page_names))
+
+    return pages
+
+def touch_page(project_dir, page):
+    """Modify the given page so that an incremental build needs to rebuild it
+
+    Args:
+    - project_dir: string: root directory of the project
+    - page: string: path of the page, relative to project_dir
+    """
+    with open(os.path.join(project_dir, page), "a") as page_file:
+        page_file.write("\nAn additional paragraph.\n")
+
+def _page_contents(page_name, xrefs, images, rng):
+    """Return the reStructuredText contents of a single page"""
+    lines = [".. _{}:".format(page_name),
+             "",
+             page_name,
+             "=" * len(page_name),
+             ""]
+    for paragraph_num in range(rng.randint(3, 8)):
+        lines.append("Paragraph {} of {}. ".format(paragraph_num, page_name) * 8)
+        lines.append("")
+    for xref in xrefs:
+        lines.append("See also :ref:`{}`.".format(xref))
+        lines.append("")
+    for image in images:
+        lines.append(".. image:: ../{}/{}".format(IMAGES_DIR, image))
+        lines.append("")
+    return "\n".join(lines)
+
+def _index_contents(page_names):
+    """Return the reStructuredText contents of the index page"""
+    lines = ["Synthetic benchmark project",
+             "===========================",
+             "",
+             ".. toctree::",
+             "   :maxdepth: 1",
+             ""]
+    lines.extend("   {}/{}".format(PAGES_DIR, page_name) for page_name in page_names)
+    lines.append("")
+    return "\n".join(lines)
+
+def _write_file(path, contents):
+    """Write the string contents to the file at path"""
+    with open(path, "w") as outfile:
+        outfile.write(contents)
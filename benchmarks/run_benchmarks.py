@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+"""Benchmark build_docs end to end on synthetic documentation projects
+
+Usage (from the top level of this repository):
+
+    python -m benchmarks.run_benchmarks run [--pages N] [--versions N] [-o results.json]
+    python -m benchmarks.run_benchmarks compare old.json new.json [--threshold 0.1]
+
+'run' generates a synthetic project (see benchmarks/project_generator.py), times a
+set of build scenarios by running the build_docs script as a subprocess, and writes
+the timings, along with the git commit and benchmark parameters, to a JSON file.
+
+'compare' compares two such files and exits with a non-zero status if any scenario
+got slower by more than the given threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.project_generator import make_synthetic_project, touch_page, PAGES_DIR
+from test.test_utils.fake_docker import install_fake_docker, STATE_DIR_ENV_VAR
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_BUILD_DOCS_SCRIPT = os.path.join(_REPO_ROOT, "build_docs")
+
+class Scenario:
+    """A single build scenario to be timed
+
+    Args:
+    - name: string: unique name for the scenario, used as a key in the results
+    - build_docs_args: list of strings: arguments to build_docs, in addition to the
+        repo root and versions (which are added by the benchmark driver)
+    - prepare: function or None: if given, called before each timed run with the
+        benchmark workspace; e.g., to modify a source file before an incremental build
+    - warm: bool: if True, do an untimed build before the timed runs
+    """
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, name, build_docs_args, prepare=None, warm=True):
+        self.name = name
+        self.build_docs_args = build_docs_args
+        self.prepare = prepare
+        self.warm = warm
+
+def _touch_first_page(workspace):
+    """Modify one page, so that an incremental build has something to do"""
+    touch_page(workspace.source_dir, workspace.pages[0])
+
+SCENARIOS = [
+    Scenario("clean_local", ["-c"], warm=False),
+    Scenario("clean_local_parallel", ["-c", "--num-parallel-versions", "4"], warm=False),
+    Scenario("incremental_local", [], prepare=_touch_first_page),
+    Scenario("noop_local", []),
+    Scenario("only_one_page_local", ["--only", PAGES_DIR + "/page00000.rst"],
+             prepare=_touch_first_page),
+    Scenario("clean_docker", ["-c", "-d"], warm=False),
+    Scenario("clean_docker_parallel", ["-c", "-d", "--num-parallel-versions", "4"],
+             warm=False),
+    Scenario("incremental_docker", ["-d"], prepare=_touch_first_page),
+    Scenario("noop_docker_image_cache_hit", ["-d"]),
+    Scenario("noop_docker_image_cache_miss", ["-d", "--docker-image-ttl", "0"]),
+]
+
+class Workspace:
+    """Temporary directory tree holding a synthetic project and its build repos
+
+    The workspace root is used as HOME for build_docs, because builds with Docker
+    require both the source and build directories to be under the home directory.
+    """
+
+    def __init__(self, root, pages):
+        self.root = root
+        self.source_dir = os.path.join(root, "source")
+        self.pages = pages
+        self.shim_dir = install_fake_docker(os.path.join(root, "shims"))
+
+    def build_repo(self, scenario_name):
+        """Return the path to a fresh build repo for the given scenario"""
+        repo = os.path.join(self.root, "build_repos", scenario_name)
+        shutil.rmtree(repo, ignore_errors=True)
+        os.makedirs(os.path.join(repo, "versions"))
+        return repo
+
+    def environment(self):
+        """Return the environment in which build_docs should be run"""
+        env = dict(os.environ)
+        env["HOME"] = self.root
+        env["PATH"] = self.shim_dir + os.pathsep + env.get("PATH", "")
+        env["PYTHONPATH"] = _REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+        env[STATE_DIR_ENV_VAR] = os.path.join(self.root, "fake_docker_state")
+        return env
+
+def run_build_docs(workspace, args):
+    """Run build_docs with the given arguments; return the elapsed wall-clock time"""
+    command = [sys.executable, _BUILD_DOCS_SCRIPT] + args
+    start = time.perf_counter()
+    subprocess.check_call(command,
+                          cwd=workspace.source_dir,
+                          env=workspace.environment(),
+                          stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def time_scenario(workspace, scenario, versions, repeat):
+    """Time the given scenario; return a dict of results
+
+    Args:
+    - workspace: Workspace object
+    - scenario: Scenario object
+    - versions: list of strings: versions to build
+    - repeat: int: number of timed runs
+    """
+    repo = workspace.build_repo(scenario.name)
+    args = ["-r", repo, "-v"] + versions + scenario.build_docs_args
+    if scenario.warm:
+        run_build_docs(workspace, args)
+    times = []
+    for _ in range(repeat):
+        if scenario.prepare is not None:
+            scenario.prepare(workspace)
+        times.append(run_build_docs(workspace, args))
+    return summarize_times(times)
+
+def run_benchmarks(opts):
+    """Generate a project, time the selected scenarios and write the results"""
+    scenarios = [scenario for scenario in SCENARIOS
+                 if opts.scenario is None or scenario.name in opts.scenario]
+    versions = ["v{}".format(num) for num in range(1, opts.versions + 1)]
+    root = tempfile.mkdtemp(prefix="build_docs_bench_")
+    try:
+        pages = make_synthetic_project(dest=os.path.join(root, "source"),
+                                       num_pages=opts.pages,
+                                       num_xrefs=opts.xrefs,
+                                       num_images=opts.images)
+        workspace = Workspace(root, pages)
+        results = {}
+        for scenario in scenarios:
+            results[scenario.name] = time_scenario(workspace, scenario,
+                                                   versions=versions,
+                                                   repeat=opts.repeat)
+            print("{:<30} median {:8.3f} s".format(scenario.name,
+                                                    results[scenario.name]["median"]))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    params = {"pages": opts.pages,
+              "xrefs": opts.xrefs,
+              "images": opts.images,
+              "versions": opts.versions,
+              "repeat": opts.repeat}
+    output = {"meta": benchmark_metadata(params),
+              "results": results}
+    with open(opts.output, "w") as outfile:
+        json.dump(output, outfile, indent=2, sort_keys=True)
+    print("Results written to {}".format(opts.output))
+
+def compare_results(opts):
+    """Compare two results files; return the number of regressions found"""
+    with open(opts.old) as oldfile:
+        old = json.load(oldfile)["results"]
+    with open(opts.new) as newfile:
+        new = json.load(newfile)["results"]
+
+    num_regressions = 0
+    for name in sorted(set(old) & set(new)):
+        ratio = new[name]["median"] / old[name]["median"]
+        if ratio > 1 + opts.threshold:
+            status = "REGRESSION"
+            num_regressions += 1
+        elif ratio < 1 - opts.threshold:
+            status = "improvement"
+        else:
+            status = ""
+        print("{:<30} {:8.3f} s -> {:8.3f} s ({:+6.1%}) {}".format(
+            name, old[name]["median"], new[name]["median"], ratio - 1, status))
+    for name in sorted(set(old) ^ set(new)):
+        print("{:<30} only present in one of the results files".format(name))
+    return num_regressions
+
+def summarize_times(times):
+    """Return a dict of results for the given list of timings (in seconds)"""
+    return {"times": times,
+            "min": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.mean(times)}
+
+def benchmark_metadata(params):
+    """Return a dict describing the conditions under which the benchmarks were run
+
+    params: dict giving the benchmark parameters, stored along with the results
+    """
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"],
+                                         cwd=_REPO_ROOT,
+                                         stderr=subprocess.DEVNULL,
+                                         universal_newlines=True).strip()
+    except (subprocess.CalledProcessError, OSError):
+        commit = None
+    return {"commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": params}
+
+def commandline_options(cmdline_args=None):
+    """Process the command-line arguments"""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawTextHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--pages", type=int, default=200,
+                            help="Number of pages in the synthetic project.\n"
+                            "Default is 200.")
+    run_parser.add_argument("--xrefs", type=int, default=5,
+                            help="Number of cross-references per page.\n"
+                            "Default is 5.")
+    run_parser.add_argument("--images", type=int, default=20,
+                            help="Number of images in the synthetic project.\n"
+                            "Default is 20.")
+    run_parser.add_argument("--versions", type=int, default=2,
+                            help="Number of versions to build in each scenario.\n"
+                            "Default is 2.")
+    run_parser.add_argument("--repeat", type=int, default=3,
+                            help="Number of timed runs per scenario.\n"
+                            "Default is 3.")
+    run_parser.add_argument("--scenario", nargs="+", default=None,
+                            choices=[scenario.name for scenario in SCENARIOS],
+                            help="Scenarios to run. Default is all scenarios.")
+    run_parser.add_argument("-o", "--output", default="bench_results.json",
+                            help="JSON file in which to store the results.\n"
+                            "Default is bench_results.json.")
+
+    compare_parser = subparsers.add_parser("compare",
+                                           help="Compare two results files")
+    compare_parser.add_argument("old", help="Results file for the baseline")
+    compare_parser.add_argument("new", help="Results file to compare against the baseline")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="Fractional slowdown considered a regression.\n"
+                                "Default is 0.1.")
+
+    return parser.parse_args(cmdline_args)
+
+def main(cmdline_args=None):
+    """Top-level function for the benchmark driver"""
+    opts = commandline_options(cmdline_args)
+    if opts.command == "run":
+        run_benchmarks(opts)
+    elif compare_results(opts) > 0:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -3,15 +3,21 @@ Functions with the main logic needed to build the command to build the docs
 """
 
 import os
-import pathlib
 from doc_builder import sys_utils
 
 # The Docker image used to build documentation via Docker
 DOCKER_IMAGE = "escomp/base"
 
+# Default time, in seconds, for which the digest that DOCKER_IMAGE resolves to is cached
+# before we check docker again
+DOCKER_IMAGE_CACHE_TTL = 24 * 60 * 60
+
 # The path in Docker's filesystem where the user's home directory is mounted
 _DOCKER_HOME = "/home/user/mounted_home"
 
+# Name of the make target added to rebuild only some source files
+_ONLY_TARGET = "build_docs_only"
+
 def get_build_dir(build_dir=None, repo_root=None, version=None):
     """Return a string giving the path to the build directory.
 
@@ -64,7 +70,8 @@ command-line argument '--doc-version {version}'""".format(build_dir=build_dir,
 
     return build_dir
 
-def get_build_command(build_dir, run_from_dir, build_target, num_make_jobs, docker_name=None):
+def get_build_command(build_dir, run_from_dir, build_target, num_make_jobs, docker_name=None,
+                      docker_image=DOCKER_IMAGE, sphinx_files=None):
     """Return a string giving the build command.
 
     Args:
@@ -76,11 +83,16 @@ def get_build_command(build_dir, run_from_dir, build_target, num_make_jobs, dock
     - num_make_jobs: int: number of parallel jobs
     - docker_name: string or None: if not None, uses a Docker container to do the build,
         with the given name
+    - docker_image: string: the Docker image to use (ignored if docker_name is None);
+        this is typically pinned to a digest (see docker_image.resolve_image_digest)
+    - sphinx_files: list of strings or None: if given, only these source files are
+        rebuilt; paths should be relative to run_from_dir
     """
     if docker_name is None:
         return _get_make_command(build_dir=build_dir,
                                  build_target=build_target,
-                                 num_make_jobs=num_make_jobs)
+                                 num_make_jobs=num_make_jobs,
+                                 sphinx_files=sphinx_files)
 
     # But if we're using Docker, we have more work to do to create the command....
 
@@ -107,7 +119,8 @@ def get_build_command(build_dir, run_from_dir, build_target, num_make_jobs, dock
 
     make_command = _get_make_command(build_dir=docker_build_dir,
                                      build_target=build_target,
-                                     num_make_jobs=num_make_jobs)
+                                     num_make_jobs=num_make_jobs,
+                                     sphinx_files=sphinx_files)
 
     docker_command = ["docker", "run",
                       "--name", docker_name,
@@ -116,19 +129,34 @@ def get_build_command(build_dir, run_from_dir, build_target, num_make_jobs, dock
                       "--workdir", docker_workdir,
                       "-t",  # "-t" is needed for colorful output
                       "--rm",
-                      DOCKER_IMAGE] + make_command
+                      docker_image] + make_command
     return docker_command
 
-def _get_make_command(build_dir, build_target, num_make_jobs):
+def _get_make_command(build_dir, build_target, num_make_jobs, sphinx_files=None):
     """Return the make command to run (as a list)
 
     Args:
     - build_dir: string giving path to directory in which we should build
     - build_target: string: target for the make command (e.g., "html")
     - num_make_jobs: int: number of parallel jobs
+    - sphinx_files: list of strings or None: if given, only these source files are
+        rebuilt
     """
     builddir_arg = "BUILDDIR={}".format(build_dir)
-    return ["make", builddir_arg, "-j", str(num_make_jobs), build_target]
+    make_command = ["make", builddir_arg, "-j", str(num_make_jobs), build_target]
+    if sphinx_files:
+        # The make-mode Sphinx Makefile (generated by sphinx-quickstart since Sphinx
+        # 1.5) runs 'sphinx-build -M TARGET SOURCEDIR BUILDDIR $(SPHINXOPTS) $(O)', but
+        # sphinx-build only accepts file names before any options. So rather than
+        # building the target directly, we add (with --eval, which needs GNU make 4.0 or
+        # later) a rule that builds it with the file names prepended to SPHINXOPTS. The
+        # rule's recipe is expanded after the Makefile is read, so it keeps the project's
+        # own SPHINXOPTS.
+        only_rule = ('{}: ; @$(MAKE) --no-print-directory {} '
+                     'SPHINXOPTS="$(strip {} $(SPHINXOPTS))"').format(
+                         _ONLY_TARGET, build_target, " ".join(sphinx_files))
+        make_command[-1:] = ["--eval={}".format(only_rule), _ONLY_TARGET]
+    return make_command
 
 def _docker_path_from_local_path(local_path, docker_mountpoint, errmsg_if_not_under_mountpoint):
     """Given a path on the local file system, return the equivalent path in Docker space
@@ -140,6 +168,9 @@ def _docker_path_from_local_path(local_path, docker_mountpoint, errmsg_if_not_un
     - errmsg_if_not_under_mountpoint: string: message to print if local_path does not
         reside under docker_mountpoint
     """
+    # pathlib is slow to import, and is only needed when building with Docker
+    import pathlib  # pylint: disable=import-outside-toplevel
+
     if not os.path.isabs(local_path):
         raise RuntimeError("Expect absolute path; got {}".format(local_path))
 
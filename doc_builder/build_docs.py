@@ -2,14 +2,14 @@
 Implementation of the top-level logic for build_docs.
 """
 
-import subprocess
+# Imports of modules that are only needed for some code paths (e.g., subprocess, which
+# isn't needed with --plan-only) are done inside the functions that need them, to keep
+# startup fast for callers that run build_docs many times.
 import argparse
 import os
-import random
-import string
 import sys
-import signal
-from doc_builder.build_commands import get_build_dir, get_build_command, DOCKER_IMAGE
+from doc_builder.build_commands import DOCKER_IMAGE, DOCKER_IMAGE_CACHE_TTL
+from doc_builder.build_plan import get_build_plan, make_docker_name
 
 def commandline_options(cmdline_args=None):
     """Process the command-line arguments.
@@ -53,6 +53,32 @@ based on the version indicated by the current branch, is:
     /path/to/doc/build/repo/versions/DOC_VERSION
 
     This usage also accepts the optional arguments described above.
+
+To see what build_docs would do without building anything, add
+--plan-only. This prints the build plan (the build directory and the
+commands to run for each version) as JSON. When building with Docker,
+the plan uses the cached image digest if there is one, and otherwise
+the unpinned image name; docker itself is not run.
+
+When building with Docker, the escomp/base image is pinned to a digest
+at the start of the run, and every container is run from that digest.
+The digest is cached (see --docker-image-ttl) and is recorded in
+build_docs_metadata.json in the build directory.
+
+To quickly rebuild just some pages (e.g., after fixing a typo), use
+--only FILE_OR_GLOB [...] or --only-changed-since GIT_REF. This passes
+the selected source files to sphinx-build, which then writes just those
+pages. The rebuilt pages are recorded in build_docs_metadata.json.
+
+After each build, the size and number of files of the build directory
+are reported, along with the change since the previous build; this
+manifest (including the largest files) is recorded in
+build_docs_metadata.json. Use --size-budget TARGET=SIZE (e.g.,
+html=500M) to fail the build if a target's output gets too large.
+
+Use --fingerprint to also record a fingerprint of the contents of each
+build directory in build_docs_metadata.json. File hashes are cached
+between runs, so only new or changed files are read.
 """
 
     parser = argparse.ArgumentParser(
@@ -90,6 +116,13 @@ based on the version indicated by the current branch, is:
                         "must reside somewhere within your home directory.".format(
                             docker_image=DOCKER_IMAGE))
 
+    parser.add_argument("--docker-image-ttl", type=float, default=DOCKER_IMAGE_CACHE_TTL,
+                        help="When building with Docker, the {docker_image} image is pinned\n"
+                        "to a digest, which is cached for this many seconds; after that,\n"
+                        "docker is queried again. Use 0 to always query docker.\n"
+                        "Default is {ttl}.".format(docker_image=DOCKER_IMAGE,
+                                                   ttl=DOCKER_IMAGE_CACHE_TTL))
+
     parser.add_argument("-t", "--build-target", default="html",
                         help="Target for the make command.\n"
                         "Default is 'html'.")
@@ -98,35 +131,134 @@ based on the version indicated by the current branch, is:
                         help="Number of parallel jobs to use for the make process.\n"
                         "Default is 4.")
 
+    only_group = parser.add_mutually_exclusive_group()
+
+    only_group.add_argument("--only", nargs='+', default=None, metavar="FILE_OR_GLOB",
+                            help="Rebuild only the given documentation source files.\n"
+                            "Each argument can be a file name or a glob pattern (where '**'\n"
+                            "matches any number of directories), relative to the current\n"
+                            "directory. This is much faster than a full build, but pages that\n"
+                            "refer to the rebuilt pages (e.g., via the table of contents) are\n"
+                            "not updated. Cannot be combined with --clean.\n"
+                            "NOTE: The files are passed to sphinx-build ahead of SPHINXOPTS,\n"
+                            "which requires a make-mode Sphinx Makefile (as generated by\n"
+                            "sphinx-quickstart since Sphinx 1.5) and GNU make 4.0 or later.")
+
+    only_group.add_argument("--only-changed-since", default=None, metavar="GIT_REF",
+                            help="Like --only, but rebuild the documentation source files that\n"
+                            "have changed since the given git ref (e.g., HEAD), including\n"
+                            "uncommitted changes and untracked files. If no source files have\n"
+                            "changed, nothing is built.")
+
+    parser.add_argument("--size-budget", action="append", default=[],
+                        type=_parse_size_budget, metavar="TARGET=SIZE",
+                        help="Fail if the output of the given build target (e.g., html)\n"
+                        "for any version is larger than SIZE, which can have a suffix of\n"
+                        "K, M or G (e.g., html=500M). This option can be given multiple\n"
+                        "times, for different targets; only the budget for the target\n"
+                        "being built applies. Regardless of this option, the size of each\n"
+                        "build, and the change since the previous build, are reported.")
+
+    parser.add_argument("--fingerprint", action="store_true",
+                        help="After building, record a fingerprint of the contents of each\n"
+                        "version's build directory (a single hash over the hashes of all\n"
+                        "of its files) in build_docs_metadata.json. Hashes of unchanged\n"
+                        "files are cached between runs, so this is fast for incremental\n"
+                        "builds.")
+
+    parser.add_argument("--num-parallel-versions", type=int, default=1,
+                        help="Number of versions to build at once, when building\n"
+                        "multiple versions. Output lines are then prefixed with the version.\n"
+                        "Default is 1 (build versions one at a time).")
+
+    parser.add_argument("--build-timeout", type=float, default=None,
+                        help="Maximum time, in seconds, for each build command (e.g., the\n"
+                        "clean or the build for a single version). If a command takes longer,\n"
+                        "it is killed and build_docs fails.\n"
+                        "Default is no timeout.")
+
+    parser.add_argument("--plan-only", action="store_true",
+                        help="Rather than building, print the build plan as JSON.\n"
+                        "The plan gives the build directory and the commands that\n"
+                        "would be run for each version.")
+
     options = parser.parse_args(cmdline_args)
+    if options.clean and (options.only is not None or
+                          options.only_changed_since is not None):
+        parser.error("--clean cannot be combined with --only or --only-changed-since")
     return options
 
-def run_build_command(build_command):
-    """Echo and then run the given build command"""
-    build_command_str = ' '.join(build_command)
-    print(build_command_str)
-    subprocess.check_call(build_command)
-
-def setup_for_docker():
-    """Do some setup for running with docker
-
-    Returns a name that should be used in the docker run command
+def _parse_size_budget(arg):
+    """Parse a TARGET=SIZE command-line argument into a (target, bytes) tuple"""
+    from doc_builder.build_size import parse_size  # pylint: disable=import-outside-toplevel
+    target, sep, size = arg.partition("=")
+    if not sep or not target:
+        raise argparse.ArgumentTypeError("expected TARGET=SIZE; got {}".format(arg))
+    try:
+        return target, parse_size(size)
+    except ValueError as err:
+        raise argparse.ArgumentTypeError(str(err))
+
+def execute_build_plan(plan, num_parallel, timeout):
+    """Run all of the commands in the given build plan (from get_build_plan)
+
+    Args:
+    - plan: dict: the build plan
+    - num_parallel: int: maximum number of versions to build at once
+    - timeout: number or None: maximum time, in seconds, for each build command
     """
-
-    docker_name = 'build_docs_' + ''.join(random.choice(string.ascii_lowercase) for _ in range(8))
-
-    # It seems that, if we kill the build_docs process with Ctrl-C, the docker process
-    # continues. Handle that by implementing a signal handler. There may be a better /
-    # more pythonic way to handle this, but this should work.
-    def sigint_kill_docker(signum, frame):
-        """Signal handler: kill docker process before exiting"""
-        # pylint: disable=unused-argument
-        docker_kill_cmd = ["docker", "kill", docker_name]
-        subprocess.check_call(docker_kill_cmd)
+    # These are slow to import, and aren't needed with --plan-only
+    # pylint: disable=import-outside-toplevel
+    from doc_builder.build_runner import run_builds
+    from doc_builder.build_metadata import read_build_metadata, write_build_metadata
+    from doc_builder.build_metadata import METADATA_FILENAME
+    from doc_builder import build_size
+    from doc_builder import tree_hash
+
+    # Read the previous size manifests before building, because a clean build removes
+    # the metadata file along with the rest of the build directory's contents
+    previous_manifests = [read_build_metadata(build["build_dir"]).get("size_manifest")
+                          for build in plan["builds"]]
+
+    # If build_docs is killed (e.g., with Ctrl-C), run_builds kills all of the running
+    # build commands, including stopping any docker containers (which otherwise would
+    # continue running), then raises KeyboardInterrupt.
+    try:
+        run_builds(builds=plan["builds"],
+                   num_parallel=num_parallel,
+                   timeout=timeout)
+    except KeyboardInterrupt:
         sys.exit(1)
-    signal.signal(signal.SIGINT, sigint_kill_docker)
 
-    return docker_name
+    over_budget = []
+    for build, previous_manifest in zip(plan["builds"], previous_manifests):
+        if not build["commands"]:
+            # Nothing was built, so the existing metadata still applies
+            continue
+        if not os.path.isdir(build["build_dir"]):
+            # Some targets (e.g., help) don't produce any output
+            continue
+        label = build["version"] or build["build_dir"]
+        manifest = build_size.make_size_manifest(build["build_dir"])
+        print(build_size.format_size_report(label, manifest, previous_manifest))
+        metadata = {"build_target": plan["build_target"],
+                    "docker_image": plan["docker_image"],
+                    "rebuilt_pages": plan["rebuilt_pages"],
+                    "size_manifest": manifest}
+        if plan["fingerprint"]:
+            hashes = tree_hash.hash_tree(build["build_dir"])
+            hashes.pop(METADATA_FILENAME, None)
+            metadata["fingerprint"] = tree_hash.tree_fingerprint(hashes)
+        write_build_metadata(build["build_dir"], metadata)
+        if plan["size_budget"] is not None:
+            message = build_size.check_size_budget(label, manifest,
+                                                   build_target=plan["build_target"],
+                                                   budget=plan["size_budget"])
+            if message is not None:
+                over_budget.append(message)
+
+    if over_budget:
+        raise RuntimeError("\n".join(over_budget))
 
 def main(cmdline_args=None):
     """Top-level function implementing build_docs.
@@ -137,13 +269,32 @@ def main(cmdline_args=None):
     opts = commandline_options(cmdline_args)
 
     if opts.build_with_docker:
-        # We potentially reuse the same docker name for multiple docker processes: the
-        # clean and the actual build. However, since a given process should end before the
-        # next one begins, and because we use '--rm' in the docker run command, this
-        # should be okay.
-        docker_name = setup_for_docker()
+        # We potentially reuse the same docker name for multiple docker processes for a
+        # given version: the clean and the actual build. However, since a given process
+        # should end before the next one begins, and because we use '--rm' in the docker
+        # run command, this should be okay. (Each version gets its own name, so that
+        # versions can be built in parallel.)
+        docker_name = make_docker_name()
+        # Resolve the image to a digest once, so that all builds in this run use exactly
+        # the same image, and so that we can record which image was used
+        # pylint: disable=import-outside-toplevel
+        from doc_builder.docker_image import resolve_image_digest, cached_image_digest
+        if opts.plan_only:
+            # Planning shouldn't run (or pull) anything, so only use a cached digest
+            docker_image = (cached_image_digest(DOCKER_IMAGE, ttl=opts.docker_image_ttl)
+                            or DOCKER_IMAGE)
+        else:
+            docker_image = resolve_image_digest(DOCKER_IMAGE, ttl=opts.docker_image_ttl)
     else:
         docker_name = None
+        docker_image = None
+
+    if opts.only is not None or opts.only_changed_since is not None:
+        from doc_builder.page_selection import get_pages_to_rebuild  # pylint: disable=import-outside-toplevel
+        sphinx_files = get_pages_to_rebuild(patterns=opts.only,
+                                            changed_since=opts.only_changed_since)
+    else:
+        sphinx_files = None
 
     # Note that we do a separate build for each version. This is
     # inefficient (assuming that the desired end result is for the
@@ -154,23 +305,27 @@ def main(cmdline_args=None):
     # multiple-versions-at-once option starts to be used a lot, we could
     # reimplement it to build just one version then copy the builds to
     # the other versions (if that gives the correct end result).
-    for version in opts.doc_version:
-
-        build_dir = get_build_dir(build_dir=opts.build_dir,
-                                  repo_root=opts.repo_root,
-                                  version=version)
-
-        if opts.clean:
-            clean_command = get_build_command(build_dir=build_dir,
-                                              run_from_dir=os.getcwd(),
-                                              build_target="clean",
-                                              num_make_jobs=opts.num_make_jobs,
-                                              docker_name=docker_name)
-            run_build_command(build_command=clean_command)
-
-        build_command = get_build_command(build_dir=build_dir,
-                                          run_from_dir=os.getcwd(),
-                                          build_target=opts.build_target,
-                                          num_make_jobs=opts.num_make_jobs,
-                                          docker_name=docker_name)
-        run_build_command(build_command=build_command)
+    plan = get_build_plan(build_dir=opts.build_dir,
+                          repo_root=opts.repo_root,
+                          versions=opts.doc_version,
+                          run_from_dir=os.getcwd(),
+                          build_target=opts.build_target,
+                          num_make_jobs=opts.num_make_jobs,
+                          clean=opts.clean,
+                          docker_name=docker_name,
+                          docker_image=docker_image,
+                          sphinx_files=sphinx_files,
+                          size_budget=dict(opts.size_budget).get(opts.build_target),
+                          fingerprint=opts.fingerprint)
+
+    if opts.plan_only:
+        import json  # pylint: disable=import-outside-toplevel
+        print(json.dumps(plan, indent=2))
+        return
+
+    if sphinx_files == []:
+        print("No documentation source files to rebuild")
+
+    execute_build_plan(plan,
+                       num_parallel=opts.num_parallel_versions,
+                       timeout=opts.build_timeout)
@@ -0,0 +1,37 @@
+"""
+Functions to record metadata about a build in the build directory
+
+The metadata file sits at the top level of the build directory, alongside the
+directories created by the build itself (e.g., html). It records how the build was
+done, e.g., which docker image was used.
+"""
+
+import json
+import os
+
+# Name of the metadata file, in the top level of the build directory
+METADATA_FILENAME = "build_docs_metadata.json"
+
+def read_build_metadata(build_dir):
+    """Return the metadata for the given build directory, as a dict
+
+    Returns an empty dict if there is no metadata file (e.g., if the directory hasn't
+    been built by build_docs before).
+    """
+    try:
+        with open(os.path.join(build_dir, METADATA_FILENAME)) as metadata_file:
+            return json.load(metadata_file)
+    except (OSError, ValueError):
+        return {}
+
+def write_build_metadata(build_dir, metadata):
+    """Update the metadata for the given build directory
+
+    Entries in the dict metadata are added to any existing metadata, replacing
+    existing entries with the same keys.
+    """
+    all_metadata = read_build_metadata(build_dir)
+    all_metadata.update(metadata)
+    with open(os.path.join(build_dir, METADATA_FILENAME), "w") as metadata_file:
+        json.dump(all_metadata, metadata_file, indent=2, sort_keys=True)
+        metadata_file.write("\n")
@@ -0,0 +1,95 @@
+"""
+Functions to create the build plan: the full set of commands that build_docs will run
+
+The build plan is a dict made up only of strings, lists and dicts, so that it can be
+serialized to JSON (e.g., with build_docs --plan-only). Creating the plan does not run
+any build commands.
+"""
+
+from doc_builder.build_commands import get_build_dir, get_build_command
+
+def get_build_plan(build_dir, repo_root, versions, run_from_dir, build_target,
+                   num_make_jobs, clean, docker_name=None, docker_image=None,
+                   sphinx_files=None, size_budget=None, fingerprint=False):
+    """Return the build plan, as a dict
+
+    The returned dict has the following keys:
+    - run_from_dir: as given
+    - build_target: as given
+    - docker_image: as given
+    - rebuilt_pages: sphinx_files, as given
+    - size_budget: as given
+    - fingerprint: as given
+    - builds: a list with one dict per version, each with the keys:
+      - version: the version (None if building without a version)
+      - build_dir: the directory in which this version is built
+      - docker_name: name of the docker container used for this version's commands,
+        or None if not building with Docker. Each version gets its own name, so that
+        versions can be built in parallel.
+      - commands: list of commands (each a list of strings) to run, in order
+
+    Args:
+    - build_dir: string or None: build directory, as given on the command line
+    - repo_root: string or None: repo root, as given on the command line
+    - versions: list of versions to build; may be [None] if no version was given
+    - run_from_dir: string giving absolute path from which the build_docs command was run
+    - build_target: string: target for the make command (e.g., "html")
+    - num_make_jobs: int: number of parallel jobs
+    - clean: bool: whether to run 'make clean' before building
+    - docker_name: string or None: if not None, uses a Docker container to do the build,
+        with a name formed from the given name
+    - docker_image: string or None: the Docker image to use; must be given if
+        docker_name is given
+    - sphinx_files: list of strings or None: if given, only these source files are
+        rebuilt; if this is an empty list, there is nothing to build, so no commands are
+        planned
+    - size_budget: int or None: maximum allowed size, in bytes, of the build target's
+        output for each version
+    - fingerprint: bool: whether to record a fingerprint of the contents of each
+        version's build directory after building
+    """
+    builds = []
+    for build_num, version in enumerate(versions):
+        version_build_dir = get_build_dir(build_dir=build_dir,
+                                          repo_root=repo_root,
+                                          version=version)
+        if docker_name is None:
+            build_docker_name = None
+        else:
+            build_docker_name = "{}_{}".format(docker_name, build_num)
+        commands = []
+        if clean:
+            commands.append(get_build_command(build_dir=version_build_dir,
+                                              run_from_dir=run_from_dir,
+                                              build_target="clean",
+                                              num_make_jobs=num_make_jobs,
+                                              docker_name=build_docker_name,
+                                              docker_image=docker_image))
+        if sphinx_files != []:
+            commands.append(get_build_command(build_dir=version_build_dir,
+                                              run_from_dir=run_from_dir,
+                                              build_target=build_target,
+                                              num_make_jobs=num_make_jobs,
+                                              docker_name=build_docker_name,
+                                              docker_image=docker_image,
+                                              sphinx_files=sphinx_files))
+        builds.append({"version": version,
+                       "build_dir": version_build_dir,
+                       "docker_name": build_docker_name,
+                       "commands": commands})
+
+    return {"run_from_dir": run_from_dir,
+            "build_target": build_target,
+            "docker_image": docker_image,
+            "rebuilt_pages": sphinx_files,
+            "size_budget": size_budget,
+            "fingerprint": fingerprint,
+            "builds": builds}
+
+def make_docker_name():
+    """Return a random name to use for the docker container"""
+    # Imported here rather than at module level to keep build_docs startup fast when
+    # Docker isn't used
+    import random  # pylint: disable=import-outside-toplevel
+    import string  # pylint: disable=import-outside-toplevel
+    return 'build_docs_' + ''.join(random.choice(string.ascii_lowercase) for _ in range(8))
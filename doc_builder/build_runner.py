@@ -0,0 +1,217 @@
+"""
+Functions to run the build commands from a build plan, possibly several at once
+
+Each command is started in its own process group, so that it (and any processes it
+starts) can be killed as a unit on timeout, failure or interrupt without relying on
+the terminal delivering the signal. Commands run inside Docker are also stopped with
+'docker kill', because killing the docker client doesn't stop the container.
+"""
+
+import asyncio
+import codecs
+import os
+import signal
+import subprocess
+import sys
+
+# Seconds to wait after SIGTERM before resorting to SIGKILL
+_TERMINATE_GRACE_PERIOD = 5
+
+# Output from a build command is copied a line at a time, or in pieces of about this
+# many bytes for longer lines
+_MAX_LINE_LENGTH = 2**20
+
+def run_builds(builds, num_parallel=1, timeout=None):
+    """Run the commands for each of the given builds
+
+    The commands within a single build are run in order; separate builds may be run
+    in parallel. If any command fails or times out, all other running commands are
+    killed and the exception is re-raised.
+
+    Raises:
+    - subprocess.CalledProcessError if a command fails
+    - subprocess.TimeoutExpired if a command takes longer than timeout
+    - KeyboardInterrupt if we receive SIGINT or SIGTERM; all commands are killed first
+
+    Args:
+    - builds: list of dicts, as in the 'builds' entry of the build plan from
+        get_build_plan
+    - num_parallel: int: maximum number of builds to run at once
+    - timeout: number or None: maximum time, in seconds, for each command
+    """
+    interrupted = asyncio.run(_run_builds(builds=builds,
+                                          num_parallel=num_parallel,
+                                          timeout=timeout))
+    if interrupted:
+        raise KeyboardInterrupt
+
+async def _run_builds(builds, num_parallel, timeout):
+    """Run the given builds; return True if we were interrupted by a signal"""
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(num_parallel)
+    prefix_output = num_parallel > 1 and len(builds) > 1
+    tasks = [asyncio.ensure_future(_run_build(build=build,
+                                              semaphore=semaphore,
+                                              timeout=timeout,
+                                              prefix_output=prefix_output))
+             for build in builds]
+
+    interrupted = []
+    def interrupt(signum):
+        # Only cancel on the first signal: cancelling again would interrupt the cleanup
+        # started by the first cancellation
+        if interrupted:
+            return
+        interrupted.append(signum)
+        for task in tasks:
+            task.cancel()
+    handled_signals = _add_signal_handlers(loop, interrupt, [signal.SIGINT, signal.SIGTERM])
+
+    try:
+        # On the first failure, cancel the remaining builds; cancelling a build kills
+        # its running command
+        _, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in pending:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        for signum in handled_signals:
+            loop.remove_signal_handler(signum)
+
+    if interrupted:
+        return True
+    for result in results:
+        if isinstance(result, BaseException) and not isinstance(result,
+                                                                asyncio.CancelledError):
+            raise result
+    return False
+
+async def _run_build(build, semaphore, timeout, prefix_output):
+    """Run the commands for a single build, in order"""
+    if prefix_output:
+        label = build["version"] or os.path.basename(build["build_dir"])
+        prefix = "[{}] ".format(label)
+    else:
+        prefix = ""
+    async with semaphore:
+        for command in build["commands"]:
+            await _run_command(command=command,
+                               prefix=prefix,
+                               timeout=timeout,
+                               docker_name=build.get("docker_name"))
+
+async def _run_command(command, prefix, timeout, docker_name):
+    """Echo and then run the given command, streaming its output with the given prefix
+
+    If the command doesn't finish within timeout seconds, if we are cancelled, or if
+    anything else goes wrong while it runs, kill the command's process group (and its
+    docker container, if docker_name is given).
+    """
+    _write_output(prefix + ' '.join(command) + "\n")
+    proc = await asyncio.create_subprocess_exec(*command,
+                                                stdout=asyncio.subprocess.PIPE,
+                                                stderr=asyncio.subprocess.STDOUT,
+                                                start_new_session=True,
+                                                limit=_MAX_LINE_LENGTH)
+    try:
+        await asyncio.wait_for(asyncio.gather(_stream_output(proc.stdout, prefix),
+                                              proc.wait()),
+                               timeout)
+    except asyncio.TimeoutError:
+        await _terminate_uncancellable(proc, docker_name)
+        raise subprocess.TimeoutExpired(command, timeout)
+    except BaseException:
+        # Including CancelledError, and errors in handling the command's output
+        await _terminate_uncancellable(proc, docker_name)
+        raise
+
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, command)
+
+async def _stream_output(stream, prefix):
+    """Copy lines from the given stream to stdout, adding prefix to each line
+
+    Lines longer than the stream's limit (e.g., progress output that uses carriage
+    returns rather than newlines) are copied in pieces.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    at_line_start = True
+    while True:
+        try:
+            chunk = await stream.readuntil(b"\n")
+        except asyncio.IncompleteReadError as err:
+            # End of output, possibly without a final newline
+            chunk = err.partial
+        except asyncio.LimitOverrunError as err:
+            # No newline within the limit; the data is still in the stream's buffer
+            chunk = await stream.read(err.consumed)
+        if not chunk:
+            _write_output(decoder.decode(b"", final=True))
+            break
+        text = decoder.decode(chunk)
+        _write_output((prefix if at_line_start else "") + text)
+        at_line_start = chunk.endswith(b"\n")
+
+async def _terminate_uncancellable(proc, docker_name):
+    """Run _terminate to completion, even if we are cancelled while waiting for it
+
+    Otherwise, a cancellation during the cleanup (e.g., during the SIGTERM grace
+    period) would skip the final SIGKILL, leaving processes running. If we are
+    cancelled, CancelledError is raised once the cleanup is complete.
+    """
+    terminate_task = asyncio.ensure_future(_terminate(proc, docker_name))
+    cancelled = False
+    while not terminate_task.done():
+        try:
+            await asyncio.shield(terminate_task)
+        except asyncio.CancelledError:
+            cancelled = True
+    terminate_task.result()
+    if cancelled:
+        raise asyncio.CancelledError
+
+async def _terminate(proc, docker_name):
+    """Kill the given process and everything in its process group, then reap it"""
+    if docker_name is not None:
+        # Killing the docker client doesn't stop the container
+        docker_kill = await asyncio.create_subprocess_exec(
+            "docker", "kill", docker_name,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL)
+        await docker_kill.wait()
+
+    _signal_process_group(proc, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(proc.wait(), _TERMINATE_GRACE_PERIOD)
+    except asyncio.TimeoutError:
+        pass
+    # Even if the main process has exited, other processes in its group may not have
+    _signal_process_group(proc, signal.SIGKILL)
+    await proc.wait()
+
+def _signal_process_group(proc, signum):
+    """Send signum to the process group led by proc, ignoring it if it's already gone"""
+    try:
+        os.killpg(proc.pid, signum)
+    except ProcessLookupError:
+        pass
+
+def _add_signal_handlers(loop, handler, signums):
+    """Call handler(signum) on receipt of each of the given signals
+
+    Returns the list of signals for which handlers were installed; handlers can't be
+    installed outside the main thread.
+    """
+    handled_signals = []
+    for signum in signums:
+        try:
+            loop.add_signal_handler(signum, handler, signum)
+        except (RuntimeError, ValueError):
+            continue
+        handled_signals.append(signum)
+    return handled_signals
+
+def _write_output(text):
+    """Write text to stdout immediately"""
+    sys.stdout.write(text)
+    sys.stdout.flush()
@@ -0,0 +1,138 @@
+"""
+Functions to track the size of build directories and check them against budgets
+
+After each build, a manifest giving the total size and number of files in the build
+directory (and in each of its top-level subdirectories, e.g., html) is recorded in the
+build metadata, so that each build can be compared with the previous one.
+"""
+
+import math
+import os
+from doc_builder.build_metadata import METADATA_FILENAME
+from doc_builder.tree_hash import scan_tree
+
+# Number of largest files recorded in the size manifest
+NUM_LARGEST_FILES = 10
+
+_SIZE_UNITS = ["", "K", "M", "G", "T"]
+
+def make_size_manifest(build_dir, num_largest=NUM_LARGEST_FILES):
+    """Return a dict describing the size of the given build directory
+
+    The dict has the keys:
+    - total_bytes: total size of all files
+    - num_files: total number of files
+    - by_directory: dict mapping each top-level subdirectory of build_dir to a dict
+      with the keys total_bytes and num_files
+    - largest_files: list of [path, size] pairs for the largest files (with paths
+      relative to build_dir), largest first
+
+    The build metadata file and symbolic links are not counted.
+
+    Args:
+    - build_dir: string: path to the build directory
+    - num_largest: int: number of largest files to record
+    """
+    total_bytes = 0
+    num_files = 0
+    by_directory = {}
+    files = []
+    for relpath, stat in scan_tree(build_dir):
+        if relpath == METADATA_FILENAME:
+            continue
+        total_bytes += stat.st_size
+        num_files += 1
+        top_dir, sep, _ = relpath.partition(os.sep)
+        if sep:
+            dir_totals = by_directory.setdefault(top_dir, {"total_bytes": 0,
+                                                           "num_files": 0})
+            dir_totals["total_bytes"] += stat.st_size
+            dir_totals["num_files"] += 1
+        files.append((stat.st_size, relpath))
+
+    files.sort(reverse=True)
+    return {"total_bytes": total_bytes,
+            "num_files": num_files,
+            "by_directory": by_directory,
+            "largest_files": [[path, size] for size, path in files[:num_largest]]}
+
+def target_size(manifest, build_target):
+    """Return the size in bytes of the output of the given build target
+
+    Sphinx puts the output of each target (e.g., html) in a subdirectory of the build
+    directory with the target's name. If there is no such subdirectory, return the
+    size of the whole build directory.
+    """
+    if build_target in manifest["by_directory"]:
+        return manifest["by_directory"][build_target]["total_bytes"]
+    return manifest["total_bytes"]
+
+def format_size_report(label, manifest, previous_manifest=None):
+    """Return a one-line string summarizing the size of a build
+
+    Args:
+    - label: string: what was built (e.g., the version)
+    - manifest: dict: size manifest from make_size_manifest
+    - previous_manifest: dict or None: size manifest from the previous build, if any
+    """
+    report = "Build size for {}: {} in {} files".format(
+        label, format_size(manifest["total_bytes"]), manifest["num_files"])
+    if previous_manifest is not None:
+        report += " ({}{}, {:+d} files since previous build)".format(
+            "+" if manifest["total_bytes"] >= previous_manifest["total_bytes"] else "-",
+            format_size(abs(manifest["total_bytes"] - previous_manifest["total_bytes"])),
+            manifest["num_files"] - previous_manifest["num_files"])
+    return report
+
+def check_size_budget(label, manifest, build_target, budget):
+    """Return a message describing the budget overrun, or None if within budget
+
+    Args:
+    - label: string: what was built (e.g., the version)
+    - manifest: dict: size manifest from make_size_manifest
+    - build_target: string: the build target (e.g., "html")
+    - budget: int: maximum allowed size, in bytes, of the build target's output
+    """
+    size = target_size(manifest, build_target)
+    if size <= budget:
+        return None
+    lines = ["Size of {} build for {} is {}, exceeding its budget of {}".format(
+        build_target, label, format_size(size), format_size(budget)),
+             "Largest files:"]
+    lines.extend("    {:>8}  {}".format(format_size(file_size), path)
+                 for path, file_size in manifest["largest_files"])
+    return "\n".join(lines)
+
+def parse_size(size_str):
+    """Parse a size like '500M' into a number of bytes
+
+    Accepts a number optionally followed by one of the suffixes K, M, G or T (powers
+    of 1024, case-insensitive, optionally followed by 'B' or 'iB').
+    """
+    number = size_str.strip().upper()
+    for suffix in ("IB", "B"):
+        if number.endswith(suffix) and len(number) > len(suffix):
+            number = number[:-len(suffix)]
+            break
+    multiplier = 1
+    if number and number[-1] in _SIZE_UNITS[1:]:
+        multiplier = 1024 ** _SIZE_UNITS.index(number[-1])
+        number = number[:-1]
+    try:
+        value = float(number)
+    except ValueError:
+        raise ValueError("Invalid size: {}".format(size_str))
+    if not math.isfinite(value) or value < 0:
+        raise ValueError("Invalid size: {}".format(size_str))
+    return int(value * multiplier)
+
+def format_size(num_bytes):
+    """Return a human-readable string for the given number of bytes (e.g., '1.5M')"""
+    size = float(num_bytes)
+    unit_index = 0
+    while size >= 1024 and unit_index < len(_SIZE_UNITS) - 1:
+        size /= 1024
+        unit_index += 1
+    if unit_index == 0:
+        return "{}B".format(num_bytes)
+    return "{:.1f}{}".format(size, _SIZE_UNITS[unit_index])
@@ -0,0 +1,91 @@
+"""
+Functions to pin the docker image used for builds to a specific digest
+
+Resolving an image name like escomp/base to a digest once per build_docs run, and
+then running every container by that digest, ensures that all of the builds in a run
+use the same toolchain, and lets us record exactly which toolchain was used. The
+resolution is cached on disk so that repeated runs don't need to query docker.
+"""
+
+import json
+import os
+import time
+from doc_builder import sys_utils
+from doc_builder.build_commands import DOCKER_IMAGE_CACHE_TTL
+
+# Name of the file (in the cache directory) holding resolved image digests
+_CACHE_FILENAME = "docker_images.json"
+
+def resolve_image_digest(image, ttl=DOCKER_IMAGE_CACHE_TTL, cache_dir=None):
+    """Return a reference to the given docker image that is pinned to a digest
+
+    If the image isn't available locally, it is pulled first (so that it isn't pulled
+    in the middle of a build).
+
+    Args:
+    - image: string: name of the image, possibly with a tag (e.g., "escomp/base")
+    - ttl: number: time, in seconds, for which a previous resolution of this image is
+        reused; if 0, always resolve the image again
+    - cache_dir: string or None: directory holding the cache file; if None, use
+        sys_utils.get_cache_dir()
+    """
+    cache_path = _cache_path(cache_dir)
+    cache = _read_cache(cache_path)
+
+    now = time.time()
+    digest = _cached_digest(cache, image, ttl, now)
+    if digest is not None:
+        return digest
+
+    digest = sys_utils.docker_image_digest(image)
+    if digest is None:
+        sys_utils.docker_pull(image)
+        digest = sys_utils.docker_image_digest(image)
+        if digest is None:
+            raise RuntimeError("Cannot determine digest of docker image {}".format(image))
+
+    cache[image] = {"digest": digest,
+                    "resolved_at": now}
+    _write_cache(cache_path, cache)
+    return digest
+
+def cached_image_digest(image, ttl=DOCKER_IMAGE_CACHE_TTL, cache_dir=None):
+    """Return the cached digest-pinned reference to the given docker image, or None
+
+    Unlike resolve_image_digest, this never runs docker: it returns None if the image
+    hasn't been resolved within the last ttl seconds. Arguments are as for
+    resolve_image_digest.
+    """
+    cache = _read_cache(_cache_path(cache_dir))
+    return _cached_digest(cache, image, ttl, time.time())
+
+def _cache_path(cache_dir):
+    """Return the path to the cache file in cache_dir (or the default cache directory,
+    if cache_dir is None)"""
+    if cache_dir is None:
+        cache_dir = sys_utils.get_cache_dir()
+    return os.path.join(cache_dir, _CACHE_FILENAME)
+
+def _cached_digest(cache, image, ttl, now):
+    """Return the digest for image from cache if it was resolved less than ttl seconds
+    before now; otherwise return None"""
+    entry = cache.get(image)
+    if entry is not None and now - entry["resolved_at"] < ttl:
+        return entry["digest"]
+    return None
+
+def _read_cache(cache_path):
+    """Return the contents of the cache file, or an empty dict if it can't be read"""
+    try:
+        with open(cache_path) as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+def _write_cache(cache_path, cache):
+    """Write the cache file, atomically so that concurrent runs can't corrupt it"""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+    with open(tmp_path, "w") as cache_file:
+        json.dump(cache, cache_file, indent=2, sort_keys=True)
+    os.replace(tmp_path, cache_path)
@@ -0,0 +1,53 @@
+"""
+Functions to determine the pages to rebuild when only some pages should be rebuilt
+
+Passing an explicit list of source files to sphinx-build makes it write just those
+pages, rather than checking every document to see what is out of date.
+"""
+
+import glob
+import os
+from doc_builder import sys_utils
+
+# File extensions of documentation source files; changes to other files (e.g., images)
+# don't select any pages for rebuilding. This deliberately excludes .txt, which is more
+# often something like requirements.txt than a page.
+SOURCE_SUFFIXES = (".rst", ".md")
+
+def get_pages_to_rebuild(patterns=None, changed_since=None):
+    """Return a sorted list of the source files to rebuild
+
+    Only documentation source files (see SOURCE_SUFFIXES) are selected. Paths are
+    relative to the current directory (which is where sphinx-build resolves them
+    from). Exactly one of patterns and changed_since should be given.
+
+    Args:
+    - patterns: list of strings or None: file names or glob patterns (where '**'
+        matches any number of directories)
+    - changed_since: string or None: a git ref; select the source files that have
+        changed since this ref, including uncommitted changes and untracked files
+    """
+    if patterns is not None:
+        pages = set()
+        for pattern in patterns:
+            matches = [path for path in glob.glob(pattern, recursive=True)
+                       if _is_source_file(path)]
+            if not matches:
+                raise RuntimeError("No documentation source files match {}".format(pattern))
+            pages.update(os.path.normpath(path) for path in matches)
+    else:
+        # Files deleted since the given ref don't need to be (and can't be) rebuilt
+        pages = set(path for path in sys_utils.git_changed_files(changed_since)
+                    if _is_source_file(path))
+
+    for page in pages:
+        # The page list is passed to sphinx-build via the whitespace-separated
+        # SPHINXOPTS make variable
+        if any(char.isspace() for char in page):
+            raise RuntimeError("Cannot rebuild only {}: file names containing "
+                               "whitespace are not supported".format(page))
+    return sorted(pages)
+
+def _is_source_file(path):
+    """Return True if path is an existing documentation source file"""
+    return path.endswith(SOURCE_SUFFIXES) and os.path.isfile(path)
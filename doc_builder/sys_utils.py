@@ -2,9 +2,14 @@
 Functions that wrap system calls, including calls to the OS, git, etc.
 """
 
-import subprocess
 import os
 
+def get_cache_dir():
+    """Return the directory in which build_docs caches information between runs"""
+    cache_root = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser('~'), ".cache")
+    return os.path.join(cache_root, "doc_builder")
+
 def git_current_branch():
     """Determines the name of the current git branch
 
@@ -13,6 +18,7 @@ def git_current_branch():
     branch_found is False, then branch_name is ''.) (branch_found will
     also be false if we're not in a git repository.)
     """
+    import subprocess  # pylint: disable=import-outside-toplevel
     cmd = ['git', 'symbolic-ref', '--short', '-q', 'HEAD']
     with open(os.devnull, 'w') as devnull:
         try:
@@ -29,3 +35,64 @@ def git_current_branch():
             branch_name = branch_name.strip()
 
     return branch_found, branch_name
+
+def docker_image_digest(image):
+    """Determines the digest of the given docker image, if it is available locally
+
+    Returns a string that can be used in place of image to refer to exactly this
+    image: image@sha256:... if the image has a repo digest (which is the case for
+    images that have been pulled from a registry), or the image ID (sha256:...)
+    otherwise. Returns None if the image isn't available locally (or if docker isn't
+    available).
+    """
+    import subprocess  # pylint: disable=import-outside-toplevel
+    cmd = ['docker', 'image', 'inspect',
+           '--format', '{{.Id}} {{join .RepoDigests " "}}',
+           image]
+    try:
+        output = subprocess.check_output(cmd,
+                                         stderr=subprocess.DEVNULL,
+                                         universal_newlines=True)
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+    image_id, *repo_digests = output.split()
+    repo = _docker_image_repo(image)
+    for repo_digest in repo_digests:
+        if repo_digest.split('@')[0] == repo:
+            return repo_digest
+    return image_id
+
+def docker_pull(image):
+    """Pull the given docker image, raising an exception if this fails"""
+    import subprocess  # pylint: disable=import-outside-toplevel
+    subprocess.check_call(['docker', 'pull', image])
+
+def _docker_image_repo(image):
+    """Return the repository part of the given image name, without tag or digest"""
+    image = image.split('@')[0]
+    # A colon after the last slash introduces a tag; a colon before it is a registry port
+    last_slash = image.rfind('/')
+    tag_colon = image.find(':', last_slash + 1)
+    if tag_colon >= 0:
+        image = image[:tag_colon]
+    return image
+
+def git_changed_files(ref):
+    """Return a list of files that differ from the given git ref
+
+    This includes files with uncommitted changes and untracked (but not ignored)
+    files. Paths are relative to the current directory, and only files under the
+    current directory are included.
+    """
+    import subprocess  # pylint: disable=import-outside-toplevel
+    # With -z, git separates paths with NUL characters and doesn't quote paths
+    # containing unusual (e.g., non-ASCII) characters
+    diff_cmd = ['git', 'diff', '--name-only', '-z', '--relative', ref, '--']
+    untracked_cmd = ['git', 'ls-files', '-z', '--others', '--exclude-standard']
+    try:
+        changed = subprocess.check_output(diff_cmd)
+        untracked = subprocess.check_output(untracked_cmd)
+    except subprocess.CalledProcessError:
+        raise RuntimeError("Problem determining files changed since git ref {}".format(ref))
+    return [os.fsdecode(path) for path in (changed + untracked).split(b"\0") if path]
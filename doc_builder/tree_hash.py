@@ -0,0 +1,175 @@
+"""
+Functions to scan and hash all of the files in a directory tree
+
+Hashing a large build tree (e.g., versions/<version>) is dominated by reading file
+contents, so we avoid it wherever possible: a persistent index records each file's
+hash along with its modification time, size and inode, and a file whose stat
+information matches the index is not read again. Files that do need hashing are
+hashed in a thread pool (hashlib releases the GIL while hashing), with large files
+memory-mapped rather than read into memory.
+"""
+
+import concurrent.futures
+import hashlib
+import json
+import mmap
+import os
+import time
+from doc_builder import sys_utils
+
+# Files at least this large (in bytes) are memory-mapped rather than read
+MMAP_THRESHOLD = 1024 * 1024
+
+# Small files are hashed in batches of up to this many files or this many bytes, to
+# amortize the overhead of handing work to the thread pool
+_BATCH_MAX_FILES = 256
+_BATCH_MAX_BYTES = 8 * 1024 * 1024
+
+# Hash algorithm used by default
+DEFAULT_ALGORITHM = "sha256"
+
+# Index entries for files modified less than this many seconds before the index was
+# written aren't trusted: the file could have been modified again within the
+# resolution of the file system's timestamps without changing its stat information.
+_RACY_INTERVAL = 2
+
+_INDEX_VERSION = 1
+
+def scan_tree(root):
+    """Yield a (relpath, stat_result) tuple for each regular file under root
+
+    relpath is relative to root. Symbolic links are neither followed nor included.
+    """
+    dirs = [""]
+    while dirs:
+        reldir = dirs.pop()
+        with os.scandir(os.path.join(root, reldir)) as entries:
+            for entry in entries:
+                relpath = os.path.join(reldir, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(relpath)
+                elif entry.is_file(follow_symlinks=False):
+                    yield relpath, entry.stat(follow_symlinks=False)
+
+def hash_file(path, algorithm=DEFAULT_ALGORITHM):
+    """Return the hex digest of the contents of the file at path"""
+    hasher = hashlib.new(algorithm)
+    with open(path, "rb") as infile:
+        size = os.fstat(infile.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                hasher.update(mapped)
+        else:
+            hasher.update(infile.read())
+    return hasher.hexdigest()
+
+def hash_tree(root, index_path=None, algorithm=DEFAULT_ALGORITHM, max_workers=None):
+    """Return a dict mapping the path (relative to root) of each file under root to its
+    hex digest
+
+    Args:
+    - root: string: path to the top of the tree
+    - index_path: string or None: path to the file holding the persistent index of
+        hashes for this tree; it is created or updated as needed. If None, use
+        default_index_path(root). If this is the empty string, no index is used.
+    - algorithm: string: name of the hashlib algorithm to use
+    - max_workers: int or None: number of threads used for hashing; if None, use the
+        concurrent.futures default
+    """
+    if index_path is None:
+        index_path = default_index_path(root)
+    if index_path:
+        index = _read_index(index_path, algorithm)
+    else:
+        index = {}
+
+    hashes = {}
+    new_index = {}
+    to_hash = {}
+    for relpath, stat in scan_tree(root):
+        key = [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+        entry = index.get(relpath)
+        if entry is not None and entry[:3] == key:
+            hashes[relpath] = entry[3]
+            new_index[relpath] = entry
+        else:
+            to_hash[relpath] = key
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [(batch, executor.submit(_hash_batch, root, batch, algorithm))
+                   for batch in _make_batches(to_hash)]
+        for batch, future in futures:
+            for relpath, digest in zip(batch, future.result()):
+                hashes[relpath] = digest
+                new_index[relpath] = to_hash[relpath] + [digest]
+
+    if index_path and (to_hash or len(new_index) != len(index)):
+        _write_index(index_path, algorithm, new_index)
+    return hashes
+
+def tree_fingerprint(hashes):
+    """Return a single hex digest identifying the contents of a tree
+
+    hashes: dict, as returned by hash_tree
+    """
+    hasher = hashlib.new(DEFAULT_ALGORITHM)
+    for relpath in sorted(hashes):
+        hasher.update("{}\0{}\n".format(relpath, hashes[relpath]).encode())
+    return hasher.hexdigest()
+
+def default_index_path(root):
+    """Return the path of the default index file for the tree at root"""
+    root_id = hashlib.sha1(os.path.abspath(root).encode()).hexdigest()
+    return os.path.join(sys_utils.get_cache_dir(), "tree_hash", root_id + ".json")
+
+def _make_batches(to_hash):
+    """Split the files to hash into batches; return a list of lists of relative paths
+
+    to_hash: dict mapping relative paths to [mtime_ns, size, inode]
+    """
+    batches = []
+    batch = []
+    batch_bytes = 0
+    for relpath, (_, size, _) in to_hash.items():
+        if batch and (len(batch) >= _BATCH_MAX_FILES or
+                      batch_bytes + size > _BATCH_MAX_BYTES):
+            batches.append(batch)
+            batch = []
+            batch_bytes = 0
+        batch.append(relpath)
+        batch_bytes += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+def _hash_batch(root, relpaths, algorithm):
+    """Return a list of the hex digests of the given files"""
+    return [hash_file(os.path.join(root, relpath), algorithm) for relpath in relpaths]
+
+def _read_index(index_path, algorithm):
+    """Return the index entries from index_path, or an empty dict if unusable
+
+    Each entry maps a relative path to [mtime_ns, size, inode, digest].
+    """
+    try:
+        with open(index_path) as index_file:
+            index = json.load(index_file)
+    except (OSError, ValueError):
+        return {}
+    if index.get("version") != _INDEX_VERSION or index.get("algorithm") != algorithm:
+        return {}
+    return index["entries"]
+
+def _write_index(index_path, algorithm, entries):
+    """Write the index, atomically, omitting entries that can't be trusted later"""
+    racy_threshold_ns = int((time.time() - _RACY_INTERVAL) * 1e9)
+    trusted = {relpath: entry for relpath, entry in entries.items()
+               if entry[0] < racy_threshold_ns}
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    tmp_path = "{}.{}.tmp".format(index_path, os.getpid())
+    with open(tmp_path, "w") as index_file:
+        json.dump({"version": _INDEX_VERSION,
+                   "algorithm": algorithm,
+                   "entries": trusted},
+                  index_file, separators=(",", ":"))
+    os.replace(tmp_path, index_path)
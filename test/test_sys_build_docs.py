@@ -7,10 +7,17 @@ import unittest
 import tempfile
 import shutil
 import os
+import io
+import json
+from unittest import mock
 from test.test_utils.git_helpers import (make_git_repo,
                                          add_git_commit,
                                          checkout_git_branch)
+from test.test_utils.test_helpers import check_call_suppress_output
+from test.test_utils.fake_docker import install_fake_docker, STATE_DIR_ENV_VAR
+from test.test_utils.fake_sphinx_build import fake_sphinx_build_command, RESULTS_FILENAME
 from doc_builder import build_docs
+from doc_builder.build_metadata import read_build_metadata
 
 class TestBuildDocs(unittest.TestCase):
     """High-level system tests of build_docs"""
@@ -104,5 +111,245 @@ html:
         self.assert_file_contents_equal(expected="hello world\n",
                                         filepath=os.path.join(build_path2, "testfile"))
 
+    def test_multiple_versions_parallel(self):
+        """Test with multiple versions being built in parallel"""
+
+        self.write_makefile()
+        build_path1 = os.path.join(self._build_versions_dir, "v1")
+        build_path2 = os.path.join(self._build_versions_dir, "v2")
+
+        args = ["--repo-root", self._build_reporoot,
+                "--doc-version", "v1", "v2",
+                "--num-parallel-versions", "2"]
+        build_docs.main(args)
+
+        self.assert_file_contents_equal(expected="hello world\n",
+                                        filepath=os.path.join(build_path1, "testfile"))
+        self.assert_file_contents_equal(expected="hello world\n",
+                                        filepath=os.path.join(build_path2, "testfile"))
+
+    def test_docker_pinned_digest(self):
+        """Test building with (fake) Docker: the image digest should be recorded in the
+        build metadata"""
+
+        self.write_makefile()
+        build_path = os.path.join(self._build_versions_dir, "v1")
+        shim_dir = install_fake_docker(os.path.join(self._sourcedir, "shims"))
+        # Building with Docker requires both the source and build directories to be
+        # under the home directory
+        env = {"HOME": os.path.dirname(self._sourcedir),
+               "PATH": shim_dir + os.pathsep + os.environ["PATH"],
+               "XDG_CACHE_HOME": os.path.join(self._build_reporoot, "cache"),
+               STATE_DIR_ENV_VAR: os.path.join(self._build_reporoot, "docker_state")}
+
+        args = ["--repo-root", self._build_reporoot,
+                "--doc-version", "v1",
+                "--build-with-docker"]
+        with mock.patch.dict(os.environ, env):
+            build_docs.main(args)
+
+        self.assert_file_contents_equal(expected="hello world\n",
+                                        filepath=os.path.join(build_path, "testfile"))
+        docker_image = read_build_metadata(build_path)["docker_image"]
+        self.assertRegex(docker_image, "^escomp/base@sha256:[0-9a-f]+$")
+
+    def test_only_changed_since(self):
+        """Test rebuilding only the pages changed since a git ref"""
+
+        makefile_contents = """
+html:
+\t@mkdir -p $(BUILDDIR)
+\t@echo "$(SPHINXOPTS)" > $(BUILDDIR)/testfile
+"""
+        with open('Makefile', 'w') as makefile:
+            makefile.write(makefile_contents)
+        with open('unchanged.rst', 'w') as page:
+            page.write('unchanged')
+        with open('changed.rst', 'w') as page:
+            page.write('original')
+        make_git_repo()
+        add_git_commit()
+        check_call_suppress_output(['git', 'add', '.'])
+        check_call_suppress_output(['git', 'commit', '-m', 'add pages'])
+        with open('changed.rst', 'w') as page:
+            page.write('changed')
+        with open('new.rst', 'w') as page:
+            page.write('new')
+        build_path = os.path.join(self._build_versions_dir, "v1")
+
+        args = ["--repo-root", self._build_reporoot,
+                "--doc-version", "v1",
+                "--only-changed-since", "HEAD"]
+        build_docs.main(args)
+
+        self.assert_file_contents_equal(expected="changed.rst new.rst\n",
+                                        filepath=os.path.join(build_path, "testfile"))
+        self.assertEqual(["changed.rst", "new.rst"],
+                         read_build_metadata(build_path)["rebuilt_pages"])
+
+    def test_only_with_sphinxopts(self):
+        """With --only and a make-mode Sphinx Makefile that sets SPHINXOPTS, the files
+        should be passed to sphinx-build along with the project's SPHINXOPTS"""
+
+        makefile_contents = """
+SPHINXOPTS    ?= -W --keep-going
+SPHINXBUILD   ?= {sphinx_build}
+SOURCEDIR     = .
+BUILDDIR      ?= _build
+
+help:
+\t@$(SPHINXBUILD) -M help "$(SOURCEDIR)" "$(BUILDDIR)" $(SPHINXOPTS) $(O)
+
+.PHONY: help Makefile
+
+%: Makefile
+\t@$(SPHINXBUILD) -M $@ "$(SOURCEDIR)" "$(BUILDDIR)" $(SPHINXOPTS) $(O)
+""".format(sphinx_build=fake_sphinx_build_command())
+        with open('Makefile', 'w') as makefile:
+            makefile.write(makefile_contents)
+        for page in ['index.rst', 'other.rst']:
+            with open(page, 'w') as myfile:
+                myfile.write('contents')
+        build_path = os.path.join(self._build_versions_dir, "v1")
+
+        args = ["--repo-root", self._build_reporoot,
+                "--doc-version", "v1",
+                "--only", "*.rst"]
+        build_docs.main(args)
+
+        with open(os.path.join(build_path, RESULTS_FILENAME)) as results_file:
+            sphinx_args = json.load(results_file)
+        self.assertEqual(["index.rst", "other.rst"], sphinx_args["filenames"])
+        self.assertTrue(sphinx_args["warningiserror"])
+        self.assertTrue(sphinx_args["keep_going"])
+
+    def test_target_without_output(self):
+        """A target that doesn't create the build directory should not fail"""
+
+        makefile_contents = """
+help:
+	@echo "some help"
+"""
+        with open('Makefile', 'w') as makefile:
+            makefile.write(makefile_contents)
+        build_path = os.path.join(self._build_versions_dir, "v1")
+
+        args = ["--repo-root", self._build_reporoot,
+                "--doc-version", "v1",
+                "--build-target", "help",
+                "--fingerprint"]
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+            build_docs.main(args)
+
+        self.assertIn("some help", mock_stdout.getvalue())
+        self.assertFalse(os.path.exists(build_path))
+
+    def test_size_manifest(self):
+        """The size of each build should be recorded in the build metadata"""
+
+        self.write_makefile()
+        build_path = os.path.join(self._build_versions_dir, "v1")
+
+        args = ["--repo-root", self._build_reporoot,
+                "--doc-version", "v1"]
+        build_docs.main(args)
+
+        manifest = read_build_metadata(build_path)["size_manifest"]
+        self.assertEqual(len("hello world\n"), manifest["total_bytes"])
+        self.assertEqual(1, manifest["num_files"])
+
+    def test_size_report_after_clean(self):
+        """A clean build should report the change in size since the previous build"""
+
+        makefile_contents = """
+html:
+\t@mkdir -p $(BUILDDIR)
+\t@echo "hello world" > $(BUILDDIR)/testfile
+
+clean:
+\t@rm -rf $(BUILDDIR)/*
+"""
+        with open('Makefile', 'w') as makefile:
+            makefile.write(makefile_contents)
+
+        args = ["--repo-root", self._build_reporoot,
+                "--doc-version", "v1"]
+        with mock.patch('sys.stdout', new_callable=io.StringIO):
+            build_docs.main(args)
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+            build_docs.main(args + ["--clean"])
+
+        self.assertIn("since previous build", mock_stdout.getvalue())
+
+    def test_size_budget_exceeded(self):
+        """If a build exceeds its size budget, build_docs should fail"""
+
+        self.write_makefile()
+
+        args = ["--repo-root", self._build_reporoot,
+                "--doc-version", "v1",
+                "--size-budget", "html=5"]
+        with self.assertRaisesRegex(RuntimeError, "exceeding its budget"):
+            build_docs.main(args)
+
+    def test_fingerprint(self):
+        """With --fingerprint, a fingerprint of the build should be recorded"""
+
+        self.write_makefile()
+        build_path = os.path.join(self._build_versions_dir, "v1")
+
+        args = ["--repo-root", self._build_reporoot,
+                "--doc-version", "v1",
+                "--fingerprint"]
+        env = {"XDG_CACHE_HOME": os.path.join(self._build_reporoot, "cache")}
+        with mock.patch.dict(os.environ, env):
+            build_docs.main(args)
+            fingerprint1 = read_build_metadata(build_path)["fingerprint"]
+            # Rebuilding with the same results (and with the build metadata now
+            # present) should give the same fingerprint
+            build_docs.main(args)
+            fingerprint2 = read_build_metadata(build_path)["fingerprint"]
+
+        self.assertRegex(fingerprint1, "^[0-9a-f]{64}$")
+        self.assertEqual(fingerprint1, fingerprint2)
+
+    def test_plan_only(self):
+        """With --plan-only, should print the plan as JSON without building anything"""
+
+        self.write_makefile()
+        build_path = os.path.join(self._build_versions_dir, "v1")
+
+        args = ["--repo-root", self._build_reporoot,
+                "--doc-version", "v1",
+                "--plan-only"]
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+            build_docs.main(args)
+
+        plan = json.loads(mock_stdout.getvalue())
+        self.assertEqual(build_path, plan["builds"][0]["build_dir"])
+        self.assertFalse(os.path.exists(build_path))
+
+    def test_plan_only_docker(self):
+        """With --plan-only and Docker, docker should not be run; without a cached
+        digest, the plan should use the unpinned image"""
+
+        self.write_makefile()
+        env = {"HOME": os.path.dirname(self._sourcedir),
+               "XDG_CACHE_HOME": os.path.join(self._build_reporoot, "cache")}
+
+        args = ["--repo-root", self._build_reporoot,
+                "--doc-version", "v1",
+                "--build-with-docker",
+                "--plan-only"]
+        with mock.patch.dict(os.environ, env):
+            with mock.patch('doc_builder.sys_utils.docker_image_digest') as mock_digest:
+                with mock.patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+                    build_docs.main(args)
+
+        mock_digest.assert_not_called()
+        plan = json.loads(mock_stdout.getvalue())
+        self.assertEqual("escomp/base", plan["docker_image"])
+        self.assertIn("escomp/base", plan["builds"][0]["commands"][0])
+
 if __name__ == '__main__':
     unittest.main()
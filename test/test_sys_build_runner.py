@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+System tests of run_builds, which runs real (small) commands
+"""
+
+import unittest
+import tempfile
+import shutil
+import os
+import io
+import signal
+import subprocess
+import threading
+import time
+from unittest import mock
+from test.test_utils.fake_docker import install_fake_docker, STATE_DIR_ENV_VAR
+from doc_builder.build_runner import run_builds
+
+class TestBuildRunner(unittest.TestCase):
+    """System tests of run_builds"""
+    # Allow long method names
+    # pylint: disable=invalid-name
+
+    # ------------------------------------------------------------------------
+    # Helper methods
+    # ------------------------------------------------------------------------
+
+    def setUp(self):
+        self._tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tempdir, ignore_errors=True)
+
+    def pidfile(self, name):
+        """Return the path to a file in which a test command can write its pid"""
+        return os.path.join(self._tempdir, name + ".pid")
+
+    def sleep_command(self, name):
+        """Return a command that starts a long sleep in a child process, writing the
+        sleep's pid to pidfile(name)"""
+        return ["sh", "-c", "sleep 30 & echo $! > {}; wait".format(self.pidfile(name))]
+
+    def wait_for_pidfile(self, name):
+        """Wait until the pidfile for the given name has been written; return the pid"""
+        for _ in range(100):
+            try:
+                with open(self.pidfile(name)) as pidfile:
+                    return int(pidfile.read())
+            except (FileNotFoundError, ValueError):
+                time.sleep(0.05)
+        raise RuntimeError("pidfile for {} not written".format(name))
+
+    def assert_process_gone(self, pid):
+        """Asserts that the process with the given pid is no longer running"""
+        # The killed process may briefly remain as a zombie of its (also killed) parent
+        for _ in range(100):
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return
+            with open("/proc/{}/stat".format(pid)) as stat:
+                if stat.read().split()[2] == "Z":
+                    return
+            time.sleep(0.05)
+        self.fail("process {} still running".format(pid))
+
+    @staticmethod
+    def build(version, *commands):
+        """Return a build dict (as in the build plan) for the given commands"""
+        return {"version": version,
+                "build_dir": "/irrelevant/path",
+                "docker_name": None,
+                "commands": list(commands)}
+
+    # ------------------------------------------------------------------------
+    # Begin tests
+    # ------------------------------------------------------------------------
+
+    def test_parallel_output_prefixed(self):
+        """When building in parallel, each output line is prefixed with the version"""
+        builds = [self.build("v1", ["echo", "hello"]),
+                  self.build("v2", ["echo", "world"])]
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+            run_builds(builds, num_parallel=2)
+        lines = mock_stdout.getvalue().splitlines()
+        self.assertIn("[v1] echo hello", lines)
+        self.assertIn("[v1] hello", lines)
+        self.assertIn("[v2] world", lines)
+
+    def test_sequential_commands_in_order(self):
+        """Commands within a build run in order, with unprefixed output"""
+        builds = [self.build("v1", ["echo", "first"], ["echo", "second"])]
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+            run_builds(builds, num_parallel=2)
+        self.assertEqual(["echo first", "first", "echo second", "second"],
+                         mock_stdout.getvalue().splitlines())
+
+    def test_failure_kills_other_builds(self):
+        """If one build fails, the others should be killed and the error raised"""
+        builds = [self.build("v1", self.sleep_command("v1")),
+                  self.build("v2", ["sh", "-c", "while [ ! -s {} ]; do sleep 0.05; done; "
+                                    "exit 3".format(self.pidfile("v1"))])]
+        with mock.patch('sys.stdout', new_callable=io.StringIO):
+            with self.assertRaises(subprocess.CalledProcessError) as context:
+                run_builds(builds, num_parallel=2)
+        self.assertEqual(3, context.exception.returncode)
+        self.assert_process_gone(self.wait_for_pidfile("v1"))
+
+    def test_timeout_kills_process_group(self):
+        """If a command times out, it and its children should be killed"""
+        builds = [self.build("v1", self.sleep_command("v1"))]
+        with mock.patch('sys.stdout', new_callable=io.StringIO):
+            with self.assertRaises(subprocess.TimeoutExpired):
+                run_builds(builds, timeout=0.5)
+        self.assert_process_gone(self.wait_for_pidfile("v1"))
+
+    def test_long_line(self):
+        """Output lines longer than the stream limit should be copied in full"""
+        command = ["sh", "-c", "head -c 5000 /dev/zero | tr '\\0' x; echo; echo done"]
+        builds = [self.build("v1", command),
+                  self.build("v2", ["echo", "other"])]
+        with mock.patch('doc_builder.build_runner._MAX_LINE_LENGTH', 1024):
+            with mock.patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+                run_builds(builds, num_parallel=2)
+        lines = mock_stdout.getvalue().splitlines()
+        self.assertIn("[v1] " + "x" * 5000, lines)
+        self.assertIn("[v1] done", lines)
+
+    def test_output_error_kills_process_group(self):
+        """If handling a command's output fails, the command and its children should be
+        killed and the error raised"""
+        builds = [self.build("v1", ["sh", "-c", "sleep 30 & echo $! > {}; echo started; "
+                                    "wait".format(self.pidfile("v1"))])]
+        def write_output(text):
+            if text == "started\n":
+                raise OSError("cannot write output")
+        with mock.patch('doc_builder.build_runner._write_output', side_effect=write_output):
+            with self.assertRaisesRegex(OSError, "cannot write output"):
+                run_builds(builds)
+        self.assert_process_gone(self.wait_for_pidfile("v1"))
+
+    def test_interrupt_kills_all_builds(self):
+        """On SIGINT, all running commands should be killed, then KeyboardInterrupt raised"""
+        builds = [self.build("v1", self.sleep_command("v1")),
+                  self.build("v2", self.sleep_command("v2"))]
+        timer = threading.Timer(1.0, os.kill, (os.getpid(), signal.SIGINT))
+        timer.start()
+        try:
+            with mock.patch('sys.stdout', new_callable=io.StringIO):
+                with self.assertRaises(KeyboardInterrupt):
+                    run_builds(builds, num_parallel=2)
+        finally:
+            timer.cancel()
+        self.assert_process_gone(self.wait_for_pidfile("v1"))
+        self.assert_process_gone(self.wait_for_pidfile("v2"))
+
+    def test_second_interrupt_still_kills_builds(self):
+        """A second SIGINT during cleanup should not prevent commands being killed
+
+        The command ignores SIGTERM, so it is only killed by the SIGKILL sent after the
+        grace period; the second SIGINT arrives during the grace period.
+        """
+        command = ["sh", "-c", "trap '' TERM; sleep 30 & echo $! > {}; wait".format(
+            self.pidfile("v1"))]
+        builds = [self.build("v1", command)]
+        timers = [threading.Timer(delay, os.kill, (os.getpid(), signal.SIGINT))
+                  for delay in (1.0, 1.5)]
+        for timer in timers:
+            timer.start()
+        try:
+            with mock.patch('doc_builder.build_runner._TERMINATE_GRACE_PERIOD', 1.5):
+                with mock.patch('sys.stdout', new_callable=io.StringIO):
+                    with self.assertRaises(KeyboardInterrupt):
+                        run_builds(builds)
+        finally:
+            for timer in timers:
+                timer.cancel()
+        self.assert_process_gone(self.wait_for_pidfile("v1"))
+
+    def test_timeout_kills_docker_container(self):
+        """If a docker command times out, its container should be killed"""
+        shim_dir = install_fake_docker(os.path.join(self._tempdir, "shims"))
+        state_dir = os.path.join(self._tempdir, "docker_state")
+        build = self.build("v1", ["docker", "run", "--name", "foo", "--rm", "image",
+                                  "sleep", "30"])
+        build["docker_name"] = "foo"
+        env = {"PATH": shim_dir + os.pathsep + os.environ["PATH"],
+               STATE_DIR_ENV_VAR: state_dir}
+        with mock.patch.dict(os.environ, env):
+            with mock.patch('sys.stdout', new_callable=io.StringIO):
+                with self.assertRaises(subprocess.TimeoutExpired):
+                    run_builds([build], timeout=1.0)
+        # The fake docker removes its record of the container when it is killed
+        self.assertEqual([], os.listdir(state_dir))
+
+if __name__ == '__main__':
+    unittest.main()
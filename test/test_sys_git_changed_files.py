@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Tests of git_changed_files
+
+These are integration tests, since they interact with the OS and git,
+and so are slower than typical unit tests.
+"""
+
+import unittest
+import tempfile
+import shutil
+import os
+from test.test_utils.git_helpers import make_git_repo, add_git_commit
+from test.test_utils.test_helpers import check_call_suppress_output
+from doc_builder.sys_utils import git_changed_files
+
+class TestGitChangedFiles(unittest.TestCase):
+    """Test the git_changed_files function"""
+
+    # ------------------------------------------------------------------------
+    # Helper methods
+    # ------------------------------------------------------------------------
+
+    def setUp(self):
+        self._return_dir = os.getcwd()
+        self._tempdir = tempfile.mkdtemp()
+        os.chdir(self._tempdir)
+        make_git_repo()
+        add_git_commit()
+
+    def tearDown(self):
+        os.chdir(self._return_dir)
+        shutil.rmtree(self._tempdir, ignore_errors=True)
+
+    @staticmethod
+    def write_file(path, contents):
+        """Write the given contents to the file at path"""
+        with open(path, 'w') as myfile:
+            myfile.write(contents)
+
+    # ------------------------------------------------------------------------
+    # Begin tests
+    # ------------------------------------------------------------------------
+
+    def test_changed_and_untracked(self):
+        """Should return both modified and untracked files, but not unchanged files"""
+        self.write_file('modified.rst', 'original')
+        self.write_file('unchanged.rst', 'original')
+        check_call_suppress_output(['git', 'add', '.'])
+        check_call_suppress_output(['git', 'commit', '-m', 'add pages'])
+        self.write_file('modified.rst', 'changed')
+        self.write_file('untracked.rst', 'new')
+        self.assertEqual(['modified.rst', 'untracked.rst'],
+                         sorted(git_changed_files('HEAD')))
+
+    def test_non_ascii_names(self):
+        """File names with non-ASCII characters should be returned unquoted"""
+        self.write_file('modifié.rst', 'original')
+        check_call_suppress_output(['git', 'add', '.'])
+        check_call_suppress_output(['git', 'commit', '-m', 'add page'])
+        self.write_file('modifié.rst', 'changed')
+        self.write_file('nouveauté.rst', 'new')
+        self.assertEqual(['modifié.rst', 'nouveauté.rst'],
+                         sorted(git_changed_files('HEAD')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+System tests of the synthetic project generator used by the benchmarks
+"""
+
+import unittest
+import tempfile
+import shutil
+import os
+from test.test_utils.test_helpers import check_call_suppress_output
+from benchmarks.project_generator import make_synthetic_project, touch_page
+
+class TestSyntheticProject(unittest.TestCase):
+    """System tests of make_synthetic_project with the fake Makefile"""
+    # Allow long method names
+    # pylint: disable=invalid-name
+
+    def setUp(self):
+        self._projectdir = tempfile.mkdtemp()
+        self._builddir = os.path.join(self._projectdir, "_build")
+
+    def tearDown(self):
+        shutil.rmtree(self._projectdir, ignore_errors=True)
+
+    def make_html(self):
+        """Run 'make html' for the project"""
+        check_call_suppress_output(["make", "-C", self._projectdir,
+                                    "BUILDDIR={}".format(self._builddir), "html"])
+
+    def test_build_creates_page_per_source(self):
+        """Building the fake project should create one html file per page, plus images"""
+        pages = make_synthetic_project(self._projectdir, num_pages=10, num_xrefs=3,
+                                       num_images=4, use_sphinx=False)
+        self.make_html()
+
+        self.assertEqual(10, len(pages))
+        for page in pages + ["index.rst"]:
+            html = os.path.join(self._builddir, "html",
+                                os.path.splitext(page)[0] + ".html")
+            self.assertTrue(os.path.isfile(html), msg=html)
+        self.assertEqual(4, len(os.listdir(os.path.join(self._builddir, "html", "_images"))))
+
+    def test_incremental_build_only_rebuilds_touched_page(self):
+        """After touching one page, an incremental build should only rewrite that page"""
+        pages = make_synthetic_project(self._projectdir, num_pages=3, use_sphinx=False)
+        self.make_html()
+        html_files = [os.path.join(self._builddir, "html",
+                                   os.path.splitext(page)[0] + ".html")
+                      for page in pages]
+        # Give all sources an old timestamp, and all outputs a newer (but still old)
+        # timestamp, so that we can tell which outputs get rewritten
+        for source in pages + ["index.rst", "conf.py"]:
+            os.utime(os.path.join(self._projectdir, source), (1000, 1000))
+        for html in html_files:
+            os.utime(html, (2000, 2000))
+
+        touch_page(self._projectdir, pages[1])
+        self.make_html()
+
+        mtimes = [os.path.getmtime(html) for html in html_files]
+        self.assertEqual(2000, mtimes[0])
+        self.assertNotEqual(2000, mtimes[1])
+        self.assertEqual(2000, mtimes[2])
+
+if __name__ == '__main__':
+    unittest.main()
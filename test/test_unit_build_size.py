@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+"""Unit test driver for the functions tracking build sizes
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+from doc_builder.build_metadata import METADATA_FILENAME
+from doc_builder.build_size import (make_size_manifest, format_size_report,
+                                    check_size_budget, parse_size, format_size)
+
+# Allow names that pylint doesn't like, because otherwise I find it hard
+# to make readable unit test names
+# pylint: disable=invalid-name
+
+class TestMakeSizeManifest(unittest.TestCase):
+    """Test the make_size_manifest function"""
+
+    def setUp(self):
+        self._build_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._build_dir, ignore_errors=True)
+
+    def write_file(self, relpath, size):
+        """Write a file of the given size at the given path relative to the build dir"""
+        path = os.path.join(self._build_dir, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as myfile:
+            myfile.write(b"x" * size)
+
+    def test_manifest(self):
+        """Tests totals, per-directory totals and largest files"""
+        self.write_file("html/index.html", 100)
+        self.write_file("html/_images/big.png", 1000)
+        self.write_file("doctrees/index.doctree", 50)
+        self.write_file("toplevel.txt", 5)
+        self.write_file(METADATA_FILENAME, 10000)
+
+        manifest = make_size_manifest(self._build_dir, num_largest=2)
+
+        self.assertEqual(1155, manifest["total_bytes"])
+        self.assertEqual(4, manifest["num_files"])
+        self.assertEqual({"html": {"total_bytes": 1100, "num_files": 2},
+                          "doctrees": {"total_bytes": 50, "num_files": 1}},
+                         manifest["by_directory"])
+        self.assertEqual([[os.path.join("html", "_images", "big.png"), 1000],
+                          [os.path.join("html", "index.html"), 100]],
+                         manifest["largest_files"])
+
+class TestSizeBudget(unittest.TestCase):
+    """Test the check_size_budget and format_size_report functions"""
+
+    _MANIFEST = {"total_bytes": 3000,
+                 "num_files": 3,
+                 "by_directory": {"html": {"total_bytes": 2048, "num_files": 2}},
+                 "largest_files": [["html/big.png", 2000], ["html/index.html", 48]]}
+
+    def test_within_budget(self):
+        """If the target's output is within budget, return None"""
+        self.assertIsNone(check_size_budget("v1", self._MANIFEST, "html", budget=2048))
+
+    def test_over_budget(self):
+        """If the target's output is over budget, the message should list the largest files"""
+        message = check_size_budget("v1", self._MANIFEST, "html", budget=2047)
+        self.assertIn("Size of html build for v1 is 2.0K", message)
+        self.assertIn("html/big.png", message)
+
+    def test_target_without_directory(self):
+        """If the target has no output directory, the whole build directory is checked"""
+        self.assertIsNotNone(check_size_budget("v1", self._MANIFEST, "latex", budget=2999))
+
+    def test_report_delta(self):
+        """The report should give the change since the previous build"""
+        previous = dict(self._MANIFEST, total_bytes=4024, num_files=4)
+        report = format_size_report("v1", self._MANIFEST, previous)
+        self.assertEqual("Build size for v1: 2.9K in 3 files "
+                         "(-1.0K, -1 files since previous build)", report)
+
+class TestSizeStrings(unittest.TestCase):
+    """Test the parse_size and format_size functions"""
+
+    def test_parse_size(self):
+        """Tests parsing sizes with various suffixes"""
+        self.assertEqual(123, parse_size("123"))
+        self.assertEqual(1536, parse_size("1.5k"))
+        self.assertEqual(500 * 1024**2, parse_size("500M"))
+        self.assertEqual(2 * 1024**3, parse_size("2GiB"))
+        self.assertEqual(10, parse_size("10B"))
+
+    def test_parse_size_invalid(self):
+        """An invalid size should raise ValueError"""
+        with self.assertRaisesRegex(ValueError, "Invalid size"):
+            parse_size("big")
+
+    def test_parse_size_not_finite_or_negative(self):
+        """Infinite, nan and negative sizes should raise ValueError"""
+        for size_str in ["inf", "infG", "nan", "-1", "-5M"]:
+            with self.assertRaisesRegex(ValueError, "Invalid size"):
+                parse_size(size_str)
+
+    def test_format_size(self):
+        """Tests formatting sizes"""
+        self.assertEqual("1000B", format_size(1000))
+        self.assertEqual("1.5K", format_size(1536))
+        self.assertEqual("3.0G", format_size(3 * 1024**3))
+
+if __name__ == '__main__':
+    unittest.main()
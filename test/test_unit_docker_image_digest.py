@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+"""Unit test driver for docker_image_digest function
+"""
+
+import unittest
+from unittest import mock
+import subprocess
+from doc_builder.sys_utils import docker_image_digest
+
+# Allow names that pylint doesn't like, because otherwise I find it hard
+# to make readable unit test names
+# pylint: disable=invalid-name
+
+@mock.patch('subprocess.check_output')
+class TestDockerImageDigest(unittest.TestCase):
+    """Test the docker_image_digest function"""
+
+    def test_repo_digest(self, mock_check_output):
+        """If the image has a repo digest for the image's repo, return that"""
+        mock_check_output.return_value = ("sha256:abcd other/image@sha256:5678 "
+                                          "escomp/base@sha256:1234\n")
+        self.assertEqual("escomp/base@sha256:1234", docker_image_digest("escomp/base:latest"))
+
+    def test_registry_with_port(self, mock_check_output):
+        """A colon in the registry's port should not be taken as a tag"""
+        mock_check_output.return_value = ("sha256:abcd "
+                                          "localhost:5000/escomp/base@sha256:1234\n")
+        self.assertEqual("localhost:5000/escomp/base@sha256:1234",
+                         docker_image_digest("localhost:5000/escomp/base"))
+
+    def test_no_repo_digest(self, mock_check_output):
+        """If the image has no repo digest (e.g., it was built locally), return its ID"""
+        mock_check_output.return_value = "sha256:abcd \n"
+        self.assertEqual("sha256:abcd", docker_image_digest("escomp/base"))
+
+    def test_image_not_found(self, mock_check_output):
+        """If docker can't find the image, return None"""
+        mock_check_output.side_effect = subprocess.CalledProcessError(1, "docker")
+        self.assertIsNone(docker_image_digest("escomp/base"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -26,6 +26,20 @@ class TestGetBuildCommand(unittest.TestCase):
         expected = ["make", "BUILDDIR=/path/to/foo", "-j", "4", "html"]
         self.assertEqual(expected, build_command)
 
+    def test_sphinx_files(self):
+        """Tests usage with a list of sphinx files to rebuild"""
+        build_command = get_build_command(build_dir="/path/to/foo",
+                                          run_from_dir="/irrelevant/path",
+                                          build_target="html",
+                                          num_make_jobs=4,
+                                          docker_name=None,
+                                          sphinx_files=["index.rst", "sub/page.rst"])
+        expected = ["make", "BUILDDIR=/path/to/foo", "-j", "4",
+                    ('--eval=build_docs_only: ; @$(MAKE) --no-print-directory html '
+                     'SPHINXOPTS="$(strip index.rst sub/page.rst $(SPHINXOPTS))"'),
+                    "build_docs_only"]
+        self.assertEqual(expected, build_command)
+
     @patch('os.path.expanduser')
     def test_docker(self, mock_expanduser):
         """Tests usage with use_docker=True"""
@@ -46,6 +60,19 @@ class TestGetBuildCommand(unittest.TestCase):
                     "-j", "4", "html"]
         self.assertEqual(expected, build_command)
 
+    @patch('os.path.expanduser')
+    def test_docker_image(self, mock_expanduser):
+        """Tests usage with use_docker=True and an explicit docker image"""
+        mock_expanduser.return_value = "/path/to/username"
+        build_command = get_build_command(build_dir="/path/to/username/foorepos/foodocs/versions/main",
+                                          run_from_dir="/path/to/username/foorepos/foocode/doc",
+                                          build_target="html",
+                                          num_make_jobs=4,
+                                          docker_name='foo',
+                                          docker_image='escomp/base@sha256:1234')
+        self.assertIn("escomp/base@sha256:1234", build_command)
+        self.assertNotIn("escomp/base", build_command)
+
     @patch('os.path.expanduser')
     def test_docker_relpath(self, mock_expanduser):
         """Tests usage with use_docker=True, with a relative path to build_dir"""
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+"""Unit test driver for get_build_plan function
+"""
+
+import json
+import unittest
+from unittest import mock
+from test.test_utils.sys_utils_fake import make_fake_isdir
+from doc_builder.build_plan import get_build_plan
+
+# Allow names that pylint doesn't like, because otherwise I find it hard
+# to make readable unit test names
+# pylint: disable=invalid-name
+
+class TestGetBuildPlan(unittest.TestCase):
+    """Test the get_build_plan function"""
+
+    def test_basic(self):
+        """Tests basic usage with a build directory"""
+        plan = get_build_plan(build_dir="/path/to/foo",
+                              repo_root=None,
+                              versions=[None],
+                              run_from_dir="/irrelevant/path",
+                              build_target="html",
+                              num_make_jobs=4,
+                              clean=False)
+        expected = {"run_from_dir": "/irrelevant/path",
+                    "build_target": "html",
+                    "docker_image": None,
+                    "rebuilt_pages": None,
+                    "size_budget": None,
+                    "fingerprint": False,
+                    "builds": [{"version": None,
+                                "build_dir": "/path/to/foo",
+                                "docker_name": None,
+                                "commands": [["make", "BUILDDIR=/path/to/foo",
+                                              "-j", "4", "html"]]}]}
+        self.assertEqual(expected, plan)
+
+    def test_clean_multiple_versions(self):
+        """Tests a clean build of multiple versions"""
+        with mock.patch('os.path.isdir') as mock_isdir:
+            mock_isdir.side_effect = make_fake_isdir(dirs_exist=["/path/to/root/versions"])
+            plan = get_build_plan(build_dir=None,
+                                  repo_root="/path/to/root",
+                                  versions=["v1", "v2"],
+                                  run_from_dir="/irrelevant/path",
+                                  build_target="html",
+                                  num_make_jobs=4,
+                                  clean=True)
+        self.assertEqual(["v1", "v2"], [build["version"] for build in plan["builds"]])
+        self.assertEqual(["/path/to/root/versions/v1", "/path/to/root/versions/v2"],
+                         [build["build_dir"] for build in plan["builds"]])
+        self.assertEqual(["make", "BUILDDIR=/path/to/root/versions/v2", "-j", "4", "clean"],
+                         plan["builds"][1]["commands"][0])
+        self.assertEqual(["make", "BUILDDIR=/path/to/root/versions/v2", "-j", "4", "html"],
+                         plan["builds"][1]["commands"][1])
+
+    @mock.patch('os.path.expanduser')
+    def test_docker_multiple_versions(self, mock_expanduser):
+        """With Docker, each version should get its own container name"""
+        mock_expanduser.return_value = "/path/to/username"
+        with mock.patch('os.path.isdir') as mock_isdir:
+            mock_isdir.side_effect = make_fake_isdir(
+                dirs_exist=["/path/to/username/root/versions"])
+            plan = get_build_plan(build_dir=None,
+                                  repo_root="/path/to/username/root",
+                                  versions=["v1", "v2"],
+                                  run_from_dir="/path/to/username/source",
+                                  build_target="html",
+                                  num_make_jobs=4,
+                                  clean=False,
+                                  docker_name="foo",
+                                  docker_image="escomp/base@sha256:1234")
+        self.assertEqual(["foo_0", "foo_1"],
+                         [build["docker_name"] for build in plan["builds"]])
+        self.assertEqual(["docker", "run", "--name", "foo_1"],
+                         plan["builds"][1]["commands"][0][:4])
+        self.assertIn("escomp/base@sha256:1234", plan["builds"][1]["commands"][0])
+
+    def test_sphinx_files(self):
+        """When rebuilding only some files, the build command should list those files"""
+        plan = get_build_plan(build_dir="/path/to/foo",
+                              repo_root=None,
+                              versions=[None],
+                              run_from_dir="/irrelevant/path",
+                              build_target="html",
+                              num_make_jobs=4,
+                              clean=False,
+                              sphinx_files=["a.rst", "b.rst"])
+        self.assertEqual(["a.rst", "b.rst"], plan["rebuilt_pages"])
+        self.assertEqual([["make", "BUILDDIR=/path/to/foo", "-j", "4",
+                           ('--eval=build_docs_only: ; @$(MAKE) --no-print-directory html '
+                            'SPHINXOPTS="$(strip a.rst b.rst $(SPHINXOPTS))"'),
+                           "build_docs_only"]],
+                         plan["builds"][0]["commands"])
+
+    def test_sphinx_files_empty(self):
+        """When there are no files to rebuild, no commands should be planned"""
+        plan = get_build_plan(build_dir="/path/to/foo",
+                              repo_root=None,
+                              versions=[None],
+                              run_from_dir="/irrelevant/path",
+                              build_target="html",
+                              num_make_jobs=4,
+                              clean=False,
+                              sphinx_files=[])
+        self.assertEqual([], plan["builds"][0]["commands"])
+
+    def test_json_roundtrip(self):
+        """The build plan should be unchanged by serializing to and from JSON"""
+        plan = get_build_plan(build_dir="/path/to/foo",
+                              repo_root=None,
+                              versions=[None],
+                              run_from_dir="/irrelevant/path",
+                              build_target="html",
+                              num_make_jobs=4,
+                              clean=True)
+        self.assertEqual(plan, json.loads(json.dumps(plan)))
+
+if __name__ == '__main__':
+    unittest.main()
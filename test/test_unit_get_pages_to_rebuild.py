@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+"""Unit test driver for get_pages_to_rebuild function
+"""
+
+import unittest
+from unittest import mock
+import os
+import shutil
+import tempfile
+from doc_builder.page_selection import get_pages_to_rebuild
+
+# Allow names that pylint doesn't like, because otherwise I find it hard
+# to make readable unit test names
+# pylint: disable=invalid-name
+
+class TestGetPagesToRebuild(unittest.TestCase):
+    """Test the get_pages_to_rebuild function"""
+
+    def setUp(self):
+        """Create and chdir to a source directory containing some files"""
+        self._return_dir = os.getcwd()
+        self._sourcedir = tempfile.mkdtemp()
+        os.chdir(self._sourcedir)
+        os.makedirs(os.path.join("sub", "subsub"))
+        for path in ["index.rst", "conf.py", "requirements.txt", os.path.join("sub", "a.rst"),
+                     os.path.join("sub", "subsub", "b.md"), os.path.join("sub", "fig.png")]:
+            with open(path, "w") as myfile:
+                myfile.write("contents")
+
+    def tearDown(self):
+        os.chdir(self._return_dir)
+        shutil.rmtree(self._sourcedir, ignore_errors=True)
+
+    def test_explicit_file(self):
+        """An explicit file name should be selected"""
+        self.assertEqual(["index.rst"], get_pages_to_rebuild(patterns=["index.rst"]))
+
+    def test_recursive_glob(self):
+        """A '**' glob should select source files at any depth, but no other files"""
+        pages = get_pages_to_rebuild(patterns=["sub/**/*"])
+        self.assertEqual([os.path.join("sub", "a.rst"),
+                          os.path.join("sub", "subsub", "b.md")], pages)
+
+    def test_duplicates_removed(self):
+        """A file matched by multiple patterns should only be selected once"""
+        pages = get_pages_to_rebuild(patterns=["index.rst", "*.rst", "./index.rst"])
+        self.assertEqual(["index.rst"], pages)
+
+    def test_no_match(self):
+        """A pattern that matches no source files should raise an exception"""
+        with self.assertRaisesRegex(RuntimeError, "No documentation source files match"):
+            get_pages_to_rebuild(patterns=["*.png"])
+
+    def test_whitespace(self):
+        """File names containing whitespace aren't supported"""
+        with open("my page.rst", "w") as myfile:
+            myfile.write("contents")
+        with self.assertRaisesRegex(RuntimeError, "whitespace"):
+            get_pages_to_rebuild(patterns=["my page.rst"])
+
+    def test_changed_since(self):
+        """With changed_since, select changed source files that still exist"""
+        with mock.patch('doc_builder.sys_utils.git_changed_files') as mock_changed_files:
+            mock_changed_files.return_value = ["sub/a.rst", "conf.py", "deleted.rst",
+                                               "sub/fig.png", "requirements.txt"]
+            pages = get_pages_to_rebuild(changed_since="HEAD")
+        mock_changed_files.assert_called_once_with("HEAD")
+        self.assertEqual(["sub/a.rst"], pages)
+
+if __name__ == '__main__':
+    unittest.main()
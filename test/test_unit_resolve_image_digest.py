@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""Unit test driver for resolve_image_digest function
+"""
+
+import unittest
+from unittest import mock
+import tempfile
+import shutil
+from doc_builder.docker_image import resolve_image_digest, cached_image_digest
+
+# Allow names that pylint doesn't like, because otherwise I find it hard
+# to make readable unit test names
+# pylint: disable=invalid-name
+
+_DIGEST = "escomp/base@sha256:1234"
+
+@mock.patch('doc_builder.sys_utils.docker_pull')
+@mock.patch('doc_builder.sys_utils.docker_image_digest')
+class TestResolveImageDigest(unittest.TestCase):
+    """Test the resolve_image_digest function"""
+
+    def setUp(self):
+        self._cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._cache_dir, ignore_errors=True)
+
+    def test_image_available(self, mock_digest, mock_pull):
+        """If the image is available locally, return its digest without pulling"""
+        mock_digest.return_value = _DIGEST
+        digest = resolve_image_digest("escomp/base", cache_dir=self._cache_dir)
+        self.assertEqual(_DIGEST, digest)
+        mock_pull.assert_not_called()
+
+    def test_image_not_available(self, mock_digest, mock_pull):
+        """If the image isn't available locally, pull it then return its digest"""
+        mock_digest.side_effect = [None, _DIGEST]
+        digest = resolve_image_digest("escomp/base", cache_dir=self._cache_dir)
+        self.assertEqual(_DIGEST, digest)
+        mock_pull.assert_called_once_with("escomp/base")
+
+    def test_image_not_available_after_pull(self, mock_digest, mock_pull):
+        """If the image can't be found even after pulling, raise an exception"""
+        # pylint: disable=unused-argument
+        mock_digest.return_value = None
+        with self.assertRaisesRegex(RuntimeError, "Cannot determine digest"):
+            resolve_image_digest("escomp/base", cache_dir=self._cache_dir)
+
+    def test_cached(self, mock_digest, mock_pull):
+        """A second resolution within the ttl should use the cache rather than docker"""
+        # pylint: disable=unused-argument
+        mock_digest.return_value = _DIGEST
+        resolve_image_digest("escomp/base", cache_dir=self._cache_dir)
+        mock_digest.return_value = "escomp/base@sha256:5678"
+        digest = resolve_image_digest("escomp/base", cache_dir=self._cache_dir)
+        self.assertEqual(_DIGEST, digest)
+        self.assertEqual(1, mock_digest.call_count)
+
+    def test_cache_expired(self, mock_digest, mock_pull):
+        """After the ttl has passed, the image should be resolved again"""
+        # pylint: disable=unused-argument
+        mock_digest.return_value = _DIGEST
+        with mock.patch('time.time', return_value=1000.):
+            resolve_image_digest("escomp/base", ttl=100, cache_dir=self._cache_dir)
+        mock_digest.return_value = "escomp/base@sha256:5678"
+        with mock.patch('time.time', return_value=1101.):
+            digest = resolve_image_digest("escomp/base", ttl=100, cache_dir=self._cache_dir)
+        self.assertEqual("escomp/base@sha256:5678", digest)
+
+    def test_ttl_zero(self, mock_digest, mock_pull):
+        """With a ttl of 0, the cache should never be used"""
+        # pylint: disable=unused-argument
+        mock_digest.return_value = _DIGEST
+        resolve_image_digest("escomp/base", ttl=0, cache_dir=self._cache_dir)
+        resolve_image_digest("escomp/base", ttl=0, cache_dir=self._cache_dir)
+        self.assertEqual(2, mock_digest.call_count)
+
+    def test_cached_image_digest(self, mock_digest, mock_pull):
+        """cached_image_digest should return a digest resolved within the ttl"""
+        mock_digest.return_value = _DIGEST
+        with mock.patch('time.time', return_value=1000.):
+            resolve_image_digest("escomp/base", ttl=100, cache_dir=self._cache_dir)
+        mock_digest.reset_mock()
+        with mock.patch('time.time', return_value=1050.):
+            digest = cached_image_digest("escomp/base", ttl=100, cache_dir=self._cache_dir)
+        self.assertEqual(_DIGEST, digest)
+        mock_digest.assert_not_called()
+        mock_pull.assert_not_called()
+
+    def test_cached_image_digest_not_cached(self, mock_digest, mock_pull):
+        """cached_image_digest should return None, without running docker, if the image
+        hasn't been resolved"""
+        digest = cached_image_digest("escomp/base", cache_dir=self._cache_dir)
+        self.assertIsNone(digest)
+        mock_digest.assert_not_called()
+        mock_pull.assert_not_called()
+
+    def test_cached_image_digest_expired(self, mock_digest, mock_pull):
+        """cached_image_digest should return None if the cached digest is too old"""
+        # pylint: disable=unused-argument
+        mock_digest.return_value = _DIGEST
+        with mock.patch('time.time', return_value=1000.):
+            resolve_image_digest("escomp/base", ttl=100, cache_dir=self._cache_dir)
+        with mock.patch('time.time', return_value=1101.):
+            digest = cached_image_digest("escomp/base", ttl=100, cache_dir=self._cache_dir)
+        self.assertIsNone(digest)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+"""Unit test driver for the tree scanning and hashing functions
+"""
+
+import unittest
+from unittest import mock
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from doc_builder import tree_hash
+from doc_builder.tree_hash import scan_tree, hash_file, hash_tree, tree_fingerprint
+
+# Allow names that pylint doesn't like, because otherwise I find it hard
+# to make readable unit test names
+# pylint: disable=invalid-name
+
+# A modification time (in seconds since the epoch) long enough ago that index entries
+# with this time are trusted
+_OLD_MTIME = 1000000000
+
+class TestTreeHash(unittest.TestCase):
+    """Test the tree scanning and hashing functions"""
+
+    def setUp(self):
+        self._tempdir = tempfile.mkdtemp()
+        self._root = os.path.join(self._tempdir, "tree")
+        self._index_path = os.path.join(self._tempdir, "index.json")
+        os.makedirs(self._root)
+
+    def tearDown(self):
+        shutil.rmtree(self._tempdir, ignore_errors=True)
+
+    def write_file(self, relpath, contents, mtime=_OLD_MTIME):
+        """Write a file with the given contents and modification time"""
+        path = os.path.join(self._root, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as myfile:
+            myfile.write(contents)
+        os.utime(path, (mtime, mtime))
+
+    def test_scan_tree(self):
+        """scan_tree should find files at all depths, but not directories or symlinks"""
+        self.write_file("a.txt", b"a")
+        self.write_file(os.path.join("sub", "subsub", "b.txt"), b"b")
+        os.symlink(os.path.join(self._root, "a.txt"), os.path.join(self._root, "link"))
+
+        found = {relpath: stat.st_size for relpath, stat in scan_tree(self._root)}
+
+        self.assertEqual({"a.txt": 1, os.path.join("sub", "subsub", "b.txt"): 1}, found)
+
+    def test_hash_file(self):
+        """hash_file should match hashlib for empty, small and memory-mapped files"""
+        contents = {"empty": b"", "small": b"small contents", "large": b"x" * 100}
+        for name, data in contents.items():
+            self.write_file(name, data)
+        with mock.patch('doc_builder.tree_hash.MMAP_THRESHOLD', 50):
+            for name, data in contents.items():
+                self.assertEqual(hashlib.sha256(data).hexdigest(),
+                                 hash_file(os.path.join(self._root, name)),
+                                 msg=name)
+
+    def test_hash_tree(self):
+        """hash_tree should return the hash of each file"""
+        self.write_file("a.txt", b"a")
+        self.write_file(os.path.join("sub", "b.txt"), b"b")
+
+        hashes = hash_tree(self._root, index_path="")
+
+        self.assertEqual({"a.txt": hashlib.sha256(b"a").hexdigest(),
+                          os.path.join("sub", "b.txt"): hashlib.sha256(b"b").hexdigest()},
+                         hashes)
+
+    def test_index_reused(self):
+        """Files whose stat information is unchanged shouldn't be rehashed"""
+        self.write_file("a.txt", b"a")
+        self.write_file("b.txt", b"b")
+        hash_tree(self._root, index_path=self._index_path)
+
+        self.write_file("b.txt", b"changed", mtime=_OLD_MTIME + 1)
+        with mock.patch('doc_builder.tree_hash.hash_file',
+                        side_effect=tree_hash.hash_file) as mock_hash_file:
+            hashes = hash_tree(self._root, index_path=self._index_path)
+
+        mock_hash_file.assert_called_once_with(os.path.join(self._root, "b.txt"), "sha256")
+        self.assertEqual(hashlib.sha256(b"a").hexdigest(), hashes["a.txt"])
+        self.assertEqual(hashlib.sha256(b"changed").hexdigest(), hashes["b.txt"])
+
+    def test_index_removes_deleted_files(self):
+        """Deleted files should be removed from the index"""
+        self.write_file("a.txt", b"a")
+        self.write_file("b.txt", b"b")
+        hash_tree(self._root, index_path=self._index_path)
+        os.remove(os.path.join(self._root, "b.txt"))
+
+        hashes = hash_tree(self._root, index_path=self._index_path)
+
+        self.assertEqual(["a.txt"], list(hashes))
+        with open(self._index_path) as index_file:
+            self.assertEqual(["a.txt"], list(json.load(index_file)["entries"]))
+
+    def test_recently_modified_not_indexed(self):
+        """Files modified very recently shouldn't be trusted in the index"""
+        self.write_file("old.txt", b"old")
+        with open(os.path.join(self._root, "new.txt"), "wb") as myfile:
+            myfile.write(b"new")
+
+        hash_tree(self._root, index_path=self._index_path)
+
+        with open(self._index_path) as index_file:
+            self.assertEqual(["old.txt"], list(json.load(index_file)["entries"]))
+
+    def test_fingerprint(self):
+        """The fingerprint should change if any file's contents change"""
+        self.write_file("a.txt", b"a")
+        self.write_file("b.txt", b"b")
+        fingerprint1 = tree_fingerprint(hash_tree(self._root, index_path=""))
+        self.write_file("b.txt", b"c")
+        fingerprint2 = tree_fingerprint(hash_tree(self._root, index_path=""))
+        self.assertNotEqual(fingerprint1, fingerprint2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+"""A fake replacement for the docker command-line tool
+
+This supports just enough of the docker CLI for build_docs: 'docker run' executes the
+given command directly on the local machine, after translating paths from the bind
+mount's target back to its source; 'docker kill' kills a command started by a
+previous 'docker run'; 'docker pull' records an image as being available locally,
+with a digest derived from the image name; 'docker image inspect' prints an image's ID
+and repo digest, in the format requested by build_docs (other formats aren't
+supported).
+
+Use install_fake_docker to get a directory containing a 'docker' executable that can
+be prepended to PATH.
+"""
+
+import hashlib
+import json
+import os
+import signal
+import sys
+import tempfile
+
+# Environment variable giving the directory in which the fake docker records its state
+# (running "containers" and pulled images)
+STATE_DIR_ENV_VAR = "FAKE_DOCKER_STATE_DIR"
+
+def install_fake_docker(shim_dir):
+    """Write a 'docker' executable into shim_dir that runs this fake docker
+
+    Returns shim_dir, which should be prepended to PATH.
+    """
+    os.makedirs(shim_dir, exist_ok=True)
+    shim_path = os.path.join(shim_dir, "docker")
+    with open(shim_path, "w") as shim:
+        shim.write('#!/bin/sh\nexec "{python}" "{script}" "$@"\n'.format(
+            python=sys.executable, script=os.path.abspath(__file__)))
+    os.chmod(shim_path, 0o755)
+    return shim_dir
+
+def main(args):
+    """Dispatch the given docker subcommand"""
+    if not args:
+        sys.exit("fake docker: no subcommand given")
+    subcommand, sub_args = args[0], args[1:]
+    if subcommand == "run":
+        _run(sub_args)
+    elif subcommand == "kill":
+        _kill(sub_args)
+    elif subcommand == "pull":
+        _pull(sub_args)
+    elif subcommand == "image" and sub_args[:1] == ["inspect"]:
+        _image_inspect(sub_args[1:])
+    else:
+        sys.exit("fake docker: unsupported subcommand {}".format(subcommand))
+
+def _run(args):
+    """Implement 'docker run': run the command locally in place of the container"""
+    name = None
+    mounts = []
+    workdir = None
+    while args and args[0].startswith("-"):
+        option, args = args[0], args[1:]
+        if option == "--name":
+            name, args = args[0], args[1:]
+        elif option == "--mount":
+            fields = dict(field.split("=", 1) for field in args[0].split(","))
+            mounts.append((fields["source"], fields["target"]))
+            args = args[1:]
+        elif option == "--workdir":
+            workdir, args = args[0], args[1:]
+        # Other options (e.g., -t, --rm) don't affect the fake run
+    # The first remaining argument is the image; the rest is the command
+    command = [_translate_path(arg, mounts) for arg in args[1:]]
+    if workdir is not None:
+        os.chdir(_translate_path(workdir, mounts))
+    if name is not None:
+        with open(_pidfile(name), "w") as pidfile:
+            pidfile.write(str(os.getpid()))
+    # Replace this process with the command, so that the pid recorded above is the
+    # pid of the running command
+    os.execvp(command[0], command)
+
+def _kill(args):
+    """Implement 'docker kill': kill the command started under the given name"""
+    for name in args:
+        try:
+            with open(_pidfile(name)) as pidfile:
+                pid = int(pidfile.read())
+        except FileNotFoundError:
+            sys.exit("fake docker: no such container: {}".format(name))
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        os.remove(_pidfile(name))
+
+def _pull(args):
+    """Implement 'docker pull': make the image available locally"""
+    image = args[-1]
+    repo = image.split(":")[0]
+    digest = "sha256:" + hashlib.sha256(image.encode()).hexdigest()
+    images = _read_images()
+    images[image] = {"id": "sha256:" + hashlib.sha256(digest.encode()).hexdigest(),
+                     "repo_digest": "{}@{}".format(repo, digest)}
+    with open(_state_path("images.json"), "w") as images_file:
+        json.dump(images, images_file)
+    print("fake docker: pulled {}".format(image))
+
+def _image_inspect(args):
+    """Implement 'docker image inspect', ignoring the requested format"""
+    image = args[-1]
+    images = _read_images()
+    if image not in images:
+        sys.exit("Error: No such image: {}".format(image))
+    print("{} {}".format(images[image]["id"], images[image]["repo_digest"]))
+
+def _read_images():
+    """Return a dict describing the images that have been pulled"""
+    try:
+        with open(_state_path("images.json")) as images_file:
+            return json.load(images_file)
+    except FileNotFoundError:
+        return {}
+
+def _translate_path(arg, mounts):
+    """Replace any mount target in arg with the corresponding mount source"""
+    for source, target in mounts:
+        arg = arg.replace(target, source)
+    return arg
+
+def _pidfile(name):
+    """Return the path to the file recording the pid of the given container"""
+    return _state_path(name + ".pid")
+
+def _state_path(filename):
+    """Return the path to the given file in the fake docker's state directory"""
+    state_dir = os.environ.get(STATE_DIR_ENV_VAR,
+                               os.path.join(tempfile.gettempdir(), "fake_docker"))
+    os.makedirs(state_dir, exist_ok=True)
+    return os.path.join(state_dir, filename)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+"""A fake replacement for sphinx-build
+
+This supports sphinx-build's make mode ('sphinx-build -M BUILDER SOURCEDIR BUILDDIR
+[OPTIONS] [FILENAMES]'), which is what the Makefile generated by sphinx-quickstart
+runs. Like the real sphinx-build in make mode, the remaining arguments are parsed by
+an argument parser of the shape of sphinx-build's own parser, so the same arguments are
+rejected. Rather than building anything, the parsed arguments are written as JSON to
+BUILDDIR/RESULTS_FILENAME.
+
+Use fake_sphinx_build_command to get a command that runs this fake sphinx-build, e.g.,
+for setting SPHINXBUILD in a Makefile.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+# Name of the file (in the build directory) in which the parsed arguments are written
+RESULTS_FILENAME = "fake_sphinx_build.json"
+
+def fake_sphinx_build_command():
+    """Return a string giving a shell command that runs this fake sphinx-build"""
+    return '"{}" "{}"'.format(sys.executable, os.path.abspath(__file__))
+
+def _get_parser():
+    """Return a parser with the same shape as sphinx-build's (with fewer options)"""
+    parser = argparse.ArgumentParser(prog="sphinx-build")
+    parser.add_argument("sourcedir")
+    parser.add_argument("outputdir")
+    parser.add_argument("filenames", nargs="*")
+    parser.add_argument("-b", dest="builder", default="html")
+    parser.add_argument("-d", dest="doctreedir")
+    parser.add_argument("-j", dest="jobs")
+    parser.add_argument("-W", dest="warningiserror", action="store_true")
+    parser.add_argument("--keep-going", action="store_true")
+    return parser
+
+def main(args):
+    """Parse the arguments as sphinx-build's make mode does, then record them"""
+    if args[:1] != ["-M"] or len(args) < 4:
+        sys.exit("fake sphinx-build: only make mode (-M) is supported")
+    builder, sourcedir, builddir = args[1:4]
+    # In make mode, sphinx-build puts the builder and directories ahead of the
+    # remaining arguments
+    opts = _get_parser().parse_args(["-b", builder,
+                                     "-d", os.path.join(builddir, "doctrees"),
+                                     sourcedir, os.path.join(builddir, builder)] + args[4:])
+    os.makedirs(builddir, exist_ok=True)
+    with open(os.path.join(builddir, RESULTS_FILENAME), "w") as results_file:
+        json.dump(vars(opts), results_file)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])